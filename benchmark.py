@@ -0,0 +1,216 @@
+"""
+Benchmarks the division methods and engines of the LogDivisor.
+
+Every division runs in its own process, so that its peak memory,
+open files and system calls are measured apart from the others.
+Without a log file, a log file of the given size is generated first.
+The system calls are counted for the dividing process only, not for
+the worker processes of the parallel engine.
+
+    python benchmark.py --size 1G --engines text binary vectorized
+    python benchmark.py path/to/file.log --methods divide_log_file
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import resource
+import threading
+import subprocess
+
+from log_divisor import LogDivisor
+from test_files.test_log_generator.generate import generate_log_file, \
+    parse_size
+
+
+METHODS = ("divide_log_file", "divide_year_and_month_wise",
+    "divide_year_and_day_wise", "divide_month_and_day_wise",
+    "divide_year_wise", "divide_month_wise", "divide_day_wise")
+
+ENGINES = {
+    "text": {},
+    "binary": {"binary_mode": True},
+    "sorted": {"sorted_input": True},
+    "parallel": {"workers": max(os.cpu_count() or 1, 2)},
+    "vectorized": {"binary_mode": True, "vectorized": True},
+    "async": {},
+}
+
+
+def read_proc_io():
+    """
+    Returns the system call counters of the process, where available.
+    """
+    try:
+        with open("/proc/self/io") as proc_io:
+            fields = dict(line.split(": ") for line in proc_io)
+    except OSError:
+        return {}
+
+    return {name: int(fields[name]) for name in ("syscr", "syscw")}
+
+
+def count_open_files():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return 0
+
+
+class OpenFilesSampler(threading.Thread):
+    """
+    Samples the amount of the open file descriptors of the process,
+    keeping the peak one.
+    """
+    def __init__(self, interval = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = count_open_files()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, count_open_files())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_division(log_file_path, method, engine, output_folder):
+    """
+    Splits the log file once, returning the measurements.
+    Meant to run in a fresh process.
+    """
+    options = dict(ENGINES[engine])
+    ld = LogDivisor(log_file_path, **options)
+    sampler = OpenFilesSampler()
+    io_before = read_proc_io()
+    sampler.start()
+    started = time.perf_counter()
+    if engine == "async":
+        asyncio.run(getattr(ld, f"{method}_async")(output_folder))
+    else:
+        getattr(ld, method)(output_folder)
+    seconds = time.perf_counter() - started
+    sampler.stop()
+    io_after = read_proc_io()
+
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * rss_unit
+    result = {
+        "seconds": seconds,
+        "peak_rss": peak_rss,
+        "peak_open_files": sampler.peak,
+        "files_opened": ld.log_subfiles.opened,
+        "files_reopened": ld.log_subfiles.reopened,
+    }
+    for name, count in io_after.items():
+        result[name] = count - io_before[name]
+    return result
+
+
+def benchmark(log_file_path, method, engine):
+    """
+    Runs the division in a subprocess, returning its measurements.
+    """
+    output_folder = tempfile.mkdtemp(prefix="log_divisor_benchmark_")
+    try:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__),
+            os.path.abspath(log_file_path), "--run", method, engine,
+            output_folder],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    return json.loads(output.splitlines()[-1])
+
+
+def count_lines(log_file_path):
+    lines = 0
+    with open(log_file_path, "rb") as log_file:
+        for block in iter(lambda: log_file.read(2**20), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}"
+
+
+def report(log_file_path, methods, engines, repeat = 1):
+    log_size = os.path.getsize(log_file_path)
+    log_lines = count_lines(log_file_path)
+    print(f"{log_file_path}: {format_size(log_size)}, {log_lines} lines")
+
+    header = (f"{'method':<28}{'engine':<12}{'seconds':>9}{'lines/s':>12}"
+        f"{'MB/s':>9}{'peak RSS':>12}{'open':>6}{'opened':>8}"
+        f"{'syscr':>10}{'syscw':>10}")
+    print(header)
+    print("-" * len(header))
+    for method in methods:
+        for engine in engines:
+            results = [benchmark(log_file_path, method, engine)
+                for _ in range(repeat)]
+            result = min(results, key=lambda result: result["seconds"])
+            seconds = max(result["seconds"], 1e-9)
+            print(f"{method:<28}{engine:<12}{seconds:>9.2f}"
+                f"{log_lines / seconds:>12.0f}"
+                f"{log_size / 2**20 / seconds:>9.1f}"
+                f"{format_size(result['peak_rss']):>12}"
+                f"{result['peak_open_files']:>6}"
+                f"{result['files_opened']:>8}"
+                f"{result.get('syscr', '-'):>10}"
+                f"{result.get('syscw', '-'):>10}")
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the division methods of the LogDivisor.")
+    parser.add_argument("log_file_path", nargs="?",
+        help="the log file to split, generated when not provided")
+    parser.add_argument("--methods", nargs="+", choices=METHODS,
+        default=METHODS)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+        default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=1,
+        help="report the fastest of the repeated divisions")
+    generated = parser.add_argument_group("generated log file")
+    generated.add_argument("--size", type=parse_size, default="100M")
+    generated.add_argument("--shuffled", action="store_true")
+    generated.add_argument("--corrupt-ratio", type=float, default=0.0)
+    generated.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--run", nargs=3, help=argparse.SUPPRESS,
+        metavar=("METHOD", "ENGINE", "OUTPUT_FOLDER"))
+    args = parser.parse_args(args)
+
+    if args.run:
+        print(json.dumps(run_division(args.log_file_path, *args.run)))
+        return
+
+    if args.log_file_path:
+        report(args.log_file_path, args.methods, args.engines, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="log_divisor_benchmark_") \
+            as folder:
+        log_file_path = os.path.join(folder, "benchmark.log")
+        generate_log_file(log_file_path, size=args.size,
+            shuffled=args.shuffled, corrupt_ratio=args.corrupt_ratio,
+            seed=args.seed)
+        report(log_file_path, args.methods, args.engines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
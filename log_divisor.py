@@ -1,11 +1,38 @@
 import os
 import re
+import bz2
+import glob
+import gzip
+import lzma
+import mmap
+import heapq
+import struct
+import json
+import time
+import asyncio
+import inspect
+import threading
+import weakref
+import shutil
+import tempfile
 import textwrap
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from itertools import chain, islice
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from logging import getLogger
-from collections import defaultdict
+from queue import Queue, Full
+from collections import OrderedDict, Counter, deque
 from enum import Flag, auto
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 logger = getLogger(__name__)
 
@@ -33,6 +60,74 @@ class WISENESS(Flag):
     YMD = Y | M | D
 
 
+_DIRECTIVE_PATTERNS = {
+    "Y": r"\d{4}",
+    "y": r"\d{2}",
+    "m": r"\d{1,2}",
+    "d": r"\d{1,2}",
+    "j": r"\d{1,3}",
+    "b": r"[A-Za-z]{3}",
+    "B": r"[A-Za-z]{3,9}",
+    "a": r"[A-Za-z]{3}",
+    "A": r"[A-Za-z]{6,9}",
+    "H": r"\d{1,2}",
+    "I": r"\d{1,2}",
+    "p": r"[AaPp][Mm]",
+    "M": r"\d{1,2}",
+    "S": r"\d{1,2}",
+    "f": r"\d{1,6}",
+    "z": r"(?:[+-]\d{2}:?\d{2}|Z)",
+    "s": r"\d{9,10}(?:\.\d+)?",
+}
+
+_FIXED_WIDTHS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+
+_MONTHS = {month: number for number, month in enumerate(("jan", "feb",
+    "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+
+_STRICT_PATTERNS = dict(_DIRECTIVE_PATTERNS, H=r"(?:[01]?\d|2[0-3])",
+    I=r"(?:1[0-2]|0?[1-9])", M=r"[0-5]?\d", S=r"[0-5]?\d")
+
+_BUCKET_DIRECTIVES = ("Yyj", "mbB", "d")
+
+
+def strp_to_regex(date_strp):
+    """
+    Compiles the strftime format into the regex, matching the timestamp.
+    Every directive gets the named group, called after the directive
+    letter, the whitespace matches any amount of whitespace.
+    """
+    pattern = _strp_to_pattern(date_strp, _DIRECTIVE_PATTERNS,
+        _DIRECTIVE_PATTERNS)
+    return f"({pattern})"
+
+
+def _strp_to_pattern(date_strp, patterns, groups):
+    pattern = [r"(?<!\d)"]
+    tokens = re.split(r"(%.)", date_strp)
+    for token in tokens:
+        if not token.startswith("%"):
+            pattern.append(re.sub(r"\\\s+|\\ ", r"\\s+", re.escape(token)))
+        elif token == "%%":
+            pattern.append("%")
+        elif token[1] in patterns:
+            directive = token[1]
+            if directive not in groups or \
+                    f"(?P<{directive}>" in "".join(pattern):
+                pattern.append(f"(?:{patterns[directive]})")
+            else:
+                pattern.append(f"(?P<{directive}>{patterns[directive]})")
+        else:
+            raise ValueError(f"Unsupported date directive {token!r}.")
+
+    if date_strp.endswith(tuple(f"%{directive}" for directive
+            in "YymdjHIMSfs")):
+        pattern.append(r"(?!\d)")
+
+    return "".join(pattern)
+
+
 class DATE_FORMAT:
     """
     Date formats representation.
@@ -40,15 +135,788 @@ class DATE_FORMAT:
     he must instance this class.
 
     The default formats are:
-        date_re = r'(\d+-\d+-\d+ \d+:\d+:\d+)'
-            used in matching the log date in log entry
         date_strp = '%Y-%m-%d %H:%M:%S'
             used in datetime date management.
+            The "%s" directive stands for the seconds since the epoch.
+        date_re = None
+            used in matching the log date in log entry.
+            By default it is compiled from the date_strp, with the named
+            group for every directive. The timestamps are then read
+            from the named groups directly, without strptime.
+            The custom regex must hold the timestamp in its first group.
+            The optional named group "date" marks the date portion
+            of the timestamp, it is used as a key to cache parsed dates.
+
+    The years of the formats without the year, like syslog,
+    are taken from the default_year attribute, the current year.
     """
-    def __init__(self, date_strp = '%Y-%m-%d %H:%M:%S',
-            date_re = r'(\d+-\d+-\d+ \d+:\d+:\d+)'):
+    def __init__(self, date_strp = '%Y-%m-%d %H:%M:%S', date_re = None):
         self.strp = date_strp
+        self._compiled = date_re is None
+        if date_re is None:
+            date_re = strp_to_regex(date_strp)
+
         self.re = re.compile(date_re)
+        self.bytes_re = re.compile(date_re.encode())
+        self.bytes_lines_re = re.compile(
+            rb"^[^\n]*?(?:" + date_re.encode() + b")", re.MULTILINE)
+        self.default_year = datetime.now().year
+        self._fields = self._get_fields(self.re, "")
+        self._date_key_groups = tuple(group for group in
+            ("date",) if group in self.re.groupindex) or tuple(
+            group for group in ("Y", "y", "m", "b", "B", "d", "j")
+            if group in self._fields)
+        self._bucket_lines_res = dict()
+
+    def __repr__(self):
+        return f"DATE_FORMAT({self.strp!r})"
+
+    @staticmethod
+    def _get_fields(regex, suffix):
+        return frozenset(name[:len(name) - len(suffix)]
+            for name in regex.groupindex if name.endswith(suffix)
+            and name[:len(name) - len(suffix)] in _DIRECTIVE_PATTERNS)
+
+    def date_key(self, match):
+        """
+        Returns the date portion of the matched timestamp, used as a cache key.
+        """
+        if "s" in self._fields:
+            return int(float(match.group("s"))) // 86400
+        if self._date_key_groups:
+            return match.group(*self._date_key_groups)
+        return match.group(1)
+
+    def extract_timestamp(self, match):
+        """
+        Returns the datetime of the matched timestamp,
+        or None if the timestamp is not valid.
+        """
+        return self._extract_timestamp(match, self._fields, "", self.strp)
+
+    def valid_time(self, match):
+        """
+        Returns whether the time fields of the matched timestamp are
+        in range, a cheaper check than the extract_timestamp, for the
+        timestamps of the dates already known to be valid.
+        """
+        return self._valid_time(match, self._fields, "", self.strp)
+
+    def get_bucket_lines_regex(self, key_length):
+        """
+        Returns the bytes regex, matching the first timestamp of every
+        log entry, if its time is valid. The timestamp directives, the
+        year (key_length 1), the month (2) or the day (3) depend on,
+        are captured, so the entries of the same sublog file give
+        the same groups.
+        Returns None for the formats with the custom regex or the epoch
+        timestamps.
+        """
+        if not self._compiled or "s" in self._fields:
+            return None
+
+        regex = self._bucket_lines_res.get(key_length)
+        if regex is None:
+            loose = _strp_to_pattern(self.strp, _DIRECTIVE_PATTERNS, "")
+            strict = _strp_to_pattern(self.strp, _STRICT_PATTERNS,
+                "".join(_BUCKET_DIRECTIVES[:key_length]))
+            if "(?P<" not in strict:
+                strict += "()"
+            regex = self._bucket_lines_res[key_length] = re.compile(
+                rf"^(?:(?!{loose})[^\n])*?{strict}".encode(), re.MULTILINE)
+        return regex
+
+    def parse(self, text):
+        """
+        Returns the datetime of the first timestamp in the text.
+        """
+        match = self.re.search(text)
+        timestamp = match and self.extract_timestamp(match)
+        if not timestamp:
+            raise ValueError(f"No {self!r} timestamp found in {text!r}.")
+        return timestamp
+
+    def get_fixed_width_layout(self):
+        """
+        Returns the layout of the fixed width timestamp, as a tuple of
+        the offsets of the directives, the offsets and bytes of the literal
+        characters, and the total width.
+        Returns None if the format has the variable width directives,
+        or misses any of the year, the month and the day.
+        """
+        fields, literals, width = dict(), list(), 0
+        for token in re.split(r"(%.)", self.strp):
+            if token.startswith("%") and token != "%%":
+                if token[1] not in _FIXED_WIDTHS:
+                    return None
+                fields.setdefault(token[1], width)
+                width += _FIXED_WIDTHS[token[1]]
+            else:
+                for character in token.replace("%%", "%").encode():
+                    literals.append((width, character))
+                    width += 1
+
+        if not {"Y", "m", "d"} <= fields.keys():
+            return None
+        return fields, literals, width
+
+    def _valid_time(self, match, fields, suffix, date_strp):
+        if not fields:
+            return self._extract_timestamp(match, fields, suffix,
+                date_strp) is not None
+
+        if "H" in fields:
+            if int(match.group("H" + suffix)) >= 24:
+                return False
+        elif "I" in fields:
+            if not 1 <= int(match.group("I" + suffix)) <= 12:
+                return False
+        return all(int(match.group(name + suffix)) < 60
+            for name in ("M", "S") if name in fields)
+
+    def _extract_timestamp(self, match, fields, suffix, date_strp):
+        if not fields:
+            timestamp = match.group(1)
+            if isinstance(timestamp, bytes):
+                timestamp = timestamp.decode(errors="replace")
+            try:
+                return datetime.strptime(timestamp, date_strp)
+            except ValueError:
+                return None
+
+        def field(name, default = 0):
+            if name not in fields:
+                return default
+            return match.group(name + suffix)
+
+        try:
+            if "s" in fields:
+                return datetime(1970, 1, 1) + timedelta(
+                    seconds=float(field("s")))
+
+            if "Y" in fields:
+                year = int(field("Y"))
+            elif "y" in fields:
+                year = int(field("y"))
+                year += 1900 if year >= 69 else 2000
+            else:
+                year = self.default_year
+
+            month_name = field("b") or field("B")
+            if month_name:
+                if isinstance(month_name, bytes):
+                    month_name = month_name.decode(errors="replace")
+                month = _MONTHS[month_name[:3].lower()]
+            else:
+                month = int(field("m", 1))
+
+            hour = int(field("H") or field("I"))
+            if "I" in fields and "H" not in fields:
+                # Like strptime, the 12 hour clock runs from 1 to 12,
+                # the 12 stands for 0 unless the period is PM.
+                if not 1 <= hour <= 12:
+                    raise ValueError(f"Invalid 12 hour clock hour {hour}.")
+                period = field("p", "am").lower()
+                hour = hour % 12 + (12 if period in ("pm", b"pm") else 0)
+
+            fraction = field("f") or b"0"
+            timestamp = datetime(year, month, int(field("d", 1)), hour,
+                int(field("M")), int(field("S")),
+                int(fraction.ljust(6, "0" if isinstance(fraction, str)
+                    else b"0")))
+
+            if "j" in fields:
+                timestamp += timedelta(int(field("j")) - 1)
+
+            return timestamp
+        except (KeyError, ValueError, OverflowError):
+            return None
+
+    @classmethod
+    def detect(cls, lines, formats = None, min_share = 0.05):
+        """
+        Returns the date format of the log entries, detected among the
+        formats, by default the DATE_FORMATS. If the entries mix several
+        formats, returns the MixedDateFormat of them, ordered by the
+        amount of the matching entries. The formats, adding less than
+        the min_share of the entries to the ones matched by the preceding
+        formats, are left out of the mix. If none of the formats match,
+        returns the default format.
+        """
+        if formats is None:
+            formats = list(DATE_FORMATS.values())
+
+        matching_lines = {date_format: set() for date_format in formats}
+        number = -1
+        for number, line in enumerate(lines):
+            for date_format in formats:
+                regex = date_format.bytes_re if isinstance(
+                    line, (bytes, memoryview)) else date_format.re
+                match = regex.search(line)
+                if match and date_format.extract_timestamp(match):
+                    matching_lines[date_format].add(number)
+
+        detected_formats = list()
+        detected_lines = set()
+        for date_format in sorted(formats,
+                key=lambda date_format: -len(matching_lines[date_format])):
+            new_lines = matching_lines[date_format] - detected_lines
+            if new_lines and (not detected_formats
+                    or len(new_lines) >= min_share * (number + 1)):
+                detected_formats.append(date_format)
+                detected_lines |= matching_lines[date_format]
+
+        if not detected_formats:
+            return cls()
+        if len(detected_formats) == 1:
+            return detected_formats[0]
+        return MixedDateFormat(detected_formats)
+
+
+class MixedDateFormat(DATE_FORMAT):
+    """
+    The combination of several date formats, for the logs mixing them.
+    Matches the first timestamp in the log entry in any of the formats,
+    the earlier formats take precedence at the same position.
+    """
+    def __init__(self, date_formats):
+        self.date_formats = list(date_formats)
+        self._alternatives = list()
+
+        patterns = list()
+        for number, date_format in enumerate(self.date_formats):
+            suffix = f"_{number}"
+            pattern = re.sub(r"\(\?P<(\w+)>", rf"(?P<\1{suffix}>",
+                date_format.re.pattern)
+            patterns.append(f"(?P<format{suffix}>{pattern})")
+            self._alternatives.append((suffix, date_format))
+
+        super().__init__(self.date_formats[0].strp, "|".join(patterns))
+        self._fields = frozenset()
+
+    def __repr__(self):
+        return f"MixedDateFormat({self.date_formats!r})"
+
+    def get_fixed_width_layout(self):
+        return None
+
+    def _get_alternative(self, match):
+        return self._alternatives[int(match.lastgroup.rsplit("_", 1)[1])]
+
+    def date_key(self, match):
+        suffix, date_format = self._get_alternative(match)
+        if "s" in date_format._fields:
+            return int(float(match.group("s" + suffix))) // 86400
+        return (suffix,) + match.group(*(group + suffix
+            for group in date_format._date_key_groups))
+
+    def extract_timestamp(self, match):
+        suffix, date_format = self._get_alternative(match)
+        return date_format._extract_timestamp(match,
+            date_format._fields, suffix, date_format.strp)
+
+    def valid_time(self, match):
+        suffix, date_format = self._get_alternative(match)
+        return date_format._valid_time(match,
+            date_format._fields, suffix, date_format.strp)
+
+
+DATE_FORMATS = {
+    "default": DATE_FORMAT('%Y-%m-%d %H:%M:%S'),
+    "iso8601": DATE_FORMAT('%Y-%m-%dT%H:%M:%S'),
+    "syslog": DATE_FORMAT('%b %d %H:%M:%S'),
+    "apache": DATE_FORMAT('%d/%b/%Y:%H:%M:%S %z'),
+    "epoch": DATE_FORMAT('%s',
+        r"(?<![^\n])(?P<s>\d{9,10}(?:\.\d+)?)(?!\d)"),
+}
+"""
+The registry of the common date formats, the log file formats are
+detected among. The apache format covers the nginx logs as well.
+The epoch timestamps are matched at the start of the log entry only,
+not to be confused with the numbers in the message.
+"""
+
+
+COMPRESSION_FORMATS = {
+    "gz": (gzip.open, gzip.compress, b"\x1f\x8b"),
+    "bz2": (bz2.open, bz2.compress, b"BZh"),
+    "xz": (lzma.open, lzma.compress, b"\xfd7zXZ\x00"),
+}
+"""
+The supported compression formats of the log and sublog files.
+Maps the file extension to the opening and compressing functions,
+as well as the magic bytes of the format.
+"""
+
+
+def detect_compression(file_path):
+    """
+    Returns the compression format of the file, by its extension
+    or by its magic bytes, or None for the uncompressed file.
+    """
+    extension = os.path.splitext(file_path)[1].lstrip(".")
+    if extension in COMPRESSION_FORMATS:
+        return extension
+
+    try:
+        with open(file_path, "rb") as compressed_file:
+            magic = compressed_file.read(6)
+    except OSError:
+        return None
+
+    for compression, (_, _, compression_magic) in COMPRESSION_FORMATS.items():
+        if magic.startswith(compression_magic):
+            return compression
+    return None
+
+
+class FileHandlePool(object):
+    """
+    The pool of open sublog file handles.
+    Keeps at most max_open_files handles open at once, closing the least
+    recently used handle when the limit is reached.
+    The file is truncated when it is opened for the first time,
+    the evicted files are reopened in the append mode.
+
+    The opened, evicted and reopened attributes count the respective
+    operations, helping to size the pool.
+    """
+    def __init__(self, max_open_files = 256, mode = "w"):
+        if max_open_files < 1:
+            raise ValueError("The pool must allow at least one open file.")
+
+        self.max_open_files = max_open_files
+        self.mode = mode
+        self.opened = 0
+        self.evicted = 0
+        self.reopened = 0
+        self._handles = OrderedDict()
+        self._seen_file_names = set()
+
+    def __len__(self):
+        return len(self._handles)
+
+    def __contains__(self, file_name):
+        return file_name in self._handles
+
+    def get(self, file_name):
+        """
+        Returns the open handle of the file, opening it when required.
+        """
+        handle = self._handles.get(file_name)
+        if handle is not None:
+            self._handles.move_to_end(file_name)
+            return handle
+
+        if len(self._handles) >= self.max_open_files:
+            _, evicted_handle = self._handles.popitem(last=False)
+            evicted_handle.close()
+            self.evicted += 1
+
+        if file_name in self._seen_file_names:
+            handle = open(file_name, self.mode.replace("w", "a"))
+            self.reopened += 1
+        else:
+            handle = open(file_name, self.mode)
+            self._seen_file_names.add(file_name)
+
+        self.opened += 1
+        self._handles[file_name] = handle
+        return handle
+
+    def flush(self):
+        """
+        Flushes every open handle of the pool.
+        """
+        for handle in self._handles.values():
+            handle.flush()
+
+    def close(self):
+        """
+        Closes every open handle of the pool.
+        """
+        while self._handles:
+            _, handle = self._handles.popitem(last=False)
+            handle.close()
+
+
+class FileSink(object):
+    """
+    The sink of the split log entries, writing them to the sublog files,
+    opened by the file pool.
+
+    A sink is any object with the write(bucket, chunks) method,
+    receiving the list of the log entries, or the chunks of them,
+    of the bucket at once. The chunks are strings in text mode, and
+    bytes-like objects in binary mode or with the compression.
+    The memoryview chunks are valid only for the time of the call.
+    """
+    def __init__(self, file_pool):
+        self.file_pool = file_pool
+
+    def write(self, file_name, chunks):
+        self.file_pool.get(file_name).writelines(chunks)
+
+
+class _BucketSink(object):
+    """
+    Passes the log entries to the sink, naming the buckets
+    by their sublog file names, relative to the output folder.
+    """
+    def __init__(self, sink, output_folder):
+        self.sink = sink
+        self._prefix_length = len(output_folder) + 1
+
+    def write(self, file_name, chunks):
+        self.sink.write(file_name[self._prefix_length:], chunks)
+
+
+class _SinkClosed(Exception):
+    pass
+
+
+class _QueueSink(object):
+    """
+    Puts the log entries into the bounded queue, in the (bucket, chunk)
+    batches of at most batch_size characters or bytes, unless a single
+    log entry is longer. Blocks while the queue is full.
+    Once closed, the following writes raise _SinkClosed.
+    """
+    def __init__(self, batch_size, max_pending_batches):
+        self.batch_size = batch_size
+        self.queue = Queue(max_pending_batches)
+        self.closed = threading.Event()
+
+    def write(self, bucket, chunks):
+        batch, size = list(), 0
+        for chunk in chunks:
+            if batch and size + len(chunk) > self.batch_size:
+                self.put((bucket, self._join(batch)))
+                batch, size = list(), 0
+
+            while len(chunk) > self.batch_size:
+                end = self._find_batch_end(chunk)
+                self.put((bucket, self._join([chunk[:end]])))
+                chunk = chunk[end:]
+
+            batch.append(chunk)
+            size += len(chunk)
+
+        if batch:
+            self.put((bucket, self._join(batch)))
+
+    def put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+        raise _SinkClosed()
+
+    def _find_batch_end(self, chunk):
+        """
+        Returns the end of the last log entry of the chunk,
+        fitting into the batch, or of the first one.
+        """
+        newline = "\n" if isinstance(chunk, str) else b"\n"
+        head = chunk[:self.batch_size]
+        head = head if isinstance(head, (str, bytes)) else bytes(head)
+        end = head.rfind(newline) + 1
+        if not end:
+            rest = chunk if isinstance(chunk, (str, bytes)) else bytes(chunk)
+            end = rest.find(newline, self.batch_size) + 1 or len(chunk)
+        return end
+
+    @staticmethod
+    def _join(batch):
+        if isinstance(batch[0], str):
+            return "".join(batch)
+        return b"".join(batch)
+
+
+class SublogWriter(object):
+    """
+    The buffered writer of the sublog files.
+    Collects the log entries in per file buffers and passes each buffer
+    to the sink with a single call. Once the total size of the buffered
+    entries exceeds the memory budget, the largest buffers are flushed
+    first, until the half of the budget is free again.
+    The file pool, given instead of the sink, is written to by a FileSink.
+    """
+    def __init__(self, sink, memory_budget = 16 * 2**20):
+        if isinstance(sink, FileHandlePool):
+            sink = FileSink(sink)
+        self.sink = sink
+        self.memory_budget = memory_budget
+        self.buffered_size = 0
+        self.flushes = 0
+        self._buffers = dict()
+        self._buffer_sizes = dict()
+
+    def write(self, file_name, line):
+        buffer = self._buffers.get(file_name)
+        if buffer is None:
+            buffer = self._buffers[file_name] = list()
+            self._buffer_sizes[file_name] = 0
+
+        buffer.append(line)
+        self._buffer_sizes[file_name] += len(line)
+        self.buffered_size += len(line)
+
+        if self.buffered_size > self.memory_budget:
+            self._flush_largest()
+
+    def flush(self, file_name):
+        buffer = self._buffers.pop(file_name, None)
+        if buffer is None:
+            return
+
+        self.sink.write(file_name, buffer)
+        self.buffered_size -= self._buffer_sizes.pop(file_name)
+        self.flushes += 1
+
+    def flush_all(self):
+        for file_name in list(self._buffers):
+            self.flush(file_name)
+
+    def clear(self):
+        """
+        Drops the buffered entries without writing them.
+        """
+        self._buffers.clear()
+        self._buffer_sizes.clear()
+        self.buffered_size = 0
+
+    def _flush_largest(self):
+        sizes = self._buffer_sizes
+        for file_name in sorted(sizes, key=sizes.get, reverse=True):
+            self.flush(file_name)
+            if self.buffered_size <= self.memory_budget // 2:
+                break
+
+    def close(self):
+        pass
+
+
+class CompressingSublogWriter(SublogWriter):
+    """
+    The buffered writer of the compressed sublog files.
+    Every flushed buffer is compressed in the thread pool into
+    a separate stream, and the compressed streams are passed
+    to the sink in order, making valid multi-stream files.
+    The file pool must open the files in binary mode.
+    """
+    def __init__(self, sink, memory_budget = 16 * 2**20,
+            compression = "gz", encoding = None, workers = None):
+        super().__init__(sink, memory_budget)
+        self.compress = COMPRESSION_FORMATS[compression][1]
+        self.encoding = encoding
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(self.workers,
+            thread_name_prefix="log_divisor_compression")
+        self._pending = deque()
+
+    def flush(self, file_name):
+        buffer = self._buffers.pop(file_name, None)
+        if buffer is None:
+            return
+
+        data = b"".join(line.encode(self.encoding)
+            if isinstance(line, str) else line for line in buffer)
+        self._pending.append(
+            (file_name, self._executor.submit(self.compress, data)))
+        self.buffered_size -= self._buffer_sizes.pop(file_name)
+        self.flushes += 1
+
+        while len(self._pending) > 2 * self.workers:
+            self._write_pending()
+
+    def flush_all(self):
+        super().flush_all()
+        while self._pending:
+            self._write_pending()
+
+    def clear(self):
+        super().clear()
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def _write_pending(self):
+        file_name, future = self._pending.popleft()
+        self.sink.write(file_name, [future.result()])
+
+
+class TimeIndex(object):
+    """
+    The sidecar time index of the log file.
+    Holds the byte offsets, where the runs of the log entries of the same
+    minute start, along with the minute keys of those runs.
+    The corrupt entries belong to the run of the preceding entry.
+
+    The index covers the log file up to the size attribute,
+    and is saved as a binary file next to the log file.
+    """
+    header = struct.Struct("<4sHQQQ?")
+    magic = b"LDIX"
+    version = 1
+
+    def __init__(self, inode = 0):
+        self.inode = inode
+        self.size = 0
+        self.ordered = True
+        self.keys = array("q")
+        self.offsets = array("q")
+
+    @staticmethod
+    def get_key(dt):
+        return (dt.toordinal() * 24 + dt.hour) * 60 + dt.minute
+
+    def add(self, key, offset):
+        if self.keys:
+            if key == self.keys[-1]:
+                return
+            if key < self.keys[-1]:
+                self.ordered = False
+
+        self.keys.append(key)
+        self.offsets.append(offset)
+
+    def get_ranges(self, start_key, end_key):
+        """
+        Yields the byte ranges of the runs of the minutes
+        between the keys, both inclusive. Adjacent runs are merged.
+        """
+        if self.ordered:
+            first = bisect_left(self.keys, start_key)
+            last = bisect_right(self.keys, end_key)
+            if first < last:
+                yield self.offsets[first], self._get_run_end(last - 1)
+            return
+
+        range_start = range_end = None
+        for run, key in enumerate(self.keys):
+            if not start_key <= key <= end_key:
+                continue
+
+            if self.offsets[run] != range_end:
+                if range_start is not None:
+                    yield range_start, range_end
+                range_start = self.offsets[run]
+            range_end = self._get_run_end(run)
+
+        if range_start is not None:
+            yield range_start, range_end
+
+    def _get_run_end(self, run):
+        if run + 1 < len(self.offsets):
+            return self.offsets[run + 1]
+        return self.size
+
+    @classmethod
+    def load(cls, index_path):
+        try:
+            with open(index_path, "rb") as index_file:
+                data = index_file.read()
+            magic, version, inode, size, count, ordered = \
+                cls.header.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+
+        if magic != cls.magic or version != cls.version:
+            return None
+
+        index = cls(inode)
+        index.size = size
+        index.ordered = ordered
+        keys_end = cls.header.size + count * index.keys.itemsize
+        if len(data) != keys_end + count * index.offsets.itemsize:
+            return None
+
+        try:
+            index.keys.frombytes(data[cls.header.size:keys_end])
+            index.offsets.frombytes(data[keys_end:])
+        except ValueError:
+            return None
+        return index
+
+    def save(self, index_path):
+        with open(f"{index_path}.tmp", "wb") as index_file:
+            index_file.write(self.header.pack(self.magic, self.version,
+                self.inode, self.size, len(self.keys), self.ordered))
+            index_file.write(self.keys.tobytes())
+            index_file.write(self.offsets.tobytes())
+        os.replace(f"{index_path}.tmp", index_path)
+
+
+class DivisionStats(object):
+    """
+    The statistics of the division, returned by the divide methods.
+
+    lines_read and bytes_read count the processed part of the log file,
+    corrupt_lines the log entries without a valid timestamp.
+    bucket_lines maps the sublog file names, relative to the output folder,
+    to the amount of their log entries.
+    files_opened, files_evicted and files_reopened count the operations
+    of the sublog file handles pool.
+    timings maps the stages of the division ("read", "parse",
+    "directories", "write", "merge", "assemble") to their cumulative
+    time in seconds,
+    summed over the worker processes of the parallel division.
+    elapsed is the wall time of the whole division.
+    """
+    def __init__(self):
+        self.lines_read = 0
+        self.bytes_read = 0
+        self.corrupt_lines = 0
+        self.bucket_lines = dict()
+        self.files_opened = 0
+        self.files_evicted = 0
+        self.files_reopened = 0
+        self.timings = dict()
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return f"DivisionStats(lines_read={self.lines_read}, " \
+            f"bytes_read={self.bytes_read}, " \
+            f"corrupt_lines={self.corrupt_lines}, " \
+            f"buckets={len(self.bucket_lines)}, " \
+            f"files_opened={self.files_opened}, elapsed={self.elapsed:.3f})"
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - started)
+
+    def merge(self, other):
+        """
+        Adds the statistics of the other division,
+        like the one of a worker process, to these ones.
+        """
+        self.lines_read += other.lines_read
+        self.bytes_read += other.bytes_read
+        self.corrupt_lines += other.corrupt_lines
+        for name, lines in other.bucket_lines.items():
+            self.bucket_lines[name] = self.bucket_lines.get(name, 0) + lines
+        self.files_opened += other.files_opened
+        self.files_evicted += other.files_evicted
+        self.files_reopened += other.files_reopened
+        for stage, seconds in other.timings.items():
+            self.add_time(stage, seconds)
+
+    def as_dict(self):
+        return dict(vars(self), bucket_lines=dict(self.bucket_lines),
+            timings=dict(self.timings))
 
 
 class LogDivisor(object):
@@ -84,62 +952,273 @@ class LogDivisor(object):
         divide_day_wise             -   Split the provided log file into smaller
             logs, each for the individual day represented in the provided log,
             under the respective year and month the day belongs to.
+
+    Every divide method returns the DivisionStats of the division,
+    also kept in the stats attribute. The optional progress callback
+    is called with the amount of the processed and total bytes
+    of the log file about every progress_interval bytes.
+
+    The iter_buckets method yields the split log entries, batched
+    by their sublog files, instead of writing them. With the sink argument,
+    the divide methods pass them to the sink instead.
+
+    Every divide method has an asynchronous counterpart, for example
+    divide_log_file_async, running the division in the shared thread pool
+    step by step, and reporting the progress between the steps.
+    At most max_concurrent_divisions divisions run at once per event loop.
     """
     date_frm = DATE_FORMAT()
+    sniff_lines = 1000
+
+    progress_interval = 16 * 2**20
+    max_concurrent_divisions = 4
+    async_block_size = 16 * 2**20
+    vectorized_block_size = 4 * 2**20
+    min_sorted_range = 64 * 2**10
+    async_block_lines = 2**16
+    _async_executor = None
+    _division_semaphores = weakref.WeakKeyDictionary()
 
     def __init__(self, log_file_path,
             save_folder_path = None,
-            custom_formats = None):
+            custom_formats = None,
+            cache_size = 1024,
+            max_open_files = 256,
+            memory_budget = 16 * 2**20,
+            binary_mode = False,
+            sorted_input = False,
+            workers = 1,
+            resume = False,
+            compression = None,
+            vectorized = False,
+            profiler = None,
+            coarse_levels = "write",
+            sink = None):
         """
         save_folder_path = provide a custom folder to save split logs into.
         custom_date_formats = provide custom date formats.
-            Must be an instance of DATE_FORMAT.
+            Must be an instance of DATE_FORMAT, or "auto" to detect
+            the format among the DATE_FORMATS by the first sniff_lines
+            log entries.
+        cache_size = the maximum amount of dates, whose sublog file names
+            are kept in memory, sparing the parsing of the following
+            log entries of the same date.
+        max_open_files = the maximum amount of simultaneously open
+            sublog files. The least recently used files are closed
+            and reopened on demand.
+        memory_budget = the amount of log entries, in characters,
+            buffered in memory before they are written to the sublog files.
+        binary_mode = process the log file as bytes. The log file is memory
+            mapped and its lines are written to the sublog files as is,
+            without decoding, so the entries with invalid characters
+            are split as well. The memory budget is counted in bytes.
+        sorted_input = assume the log entries are ordered by time.
+            Every sublog file is then a contiguous byte range of the log
+            file, found by the binary search over the timestamps and copied
+            in bulk. Every line of the range is checked to belong to the
+            same sublog file first, the ranges with corrupt or out of order
+            entries are split line by line.
+        workers = the amount of processes splitting the log file in parallel.
+            Each process splits its own newline aligned part of the log
+            file, as bytes, into the temporary shard files, which are
+            then concatenated in order into the sublog files.
+        resume = continue the division from the checkpoint of the previous
+            division, saved in the output folder, appending the new log
+            entries to the existing sublog files. The trailing incomplete
+            line is left for the next division. If the log file was
+            rotated or truncated, it is split from the start, in append mode.
+        compression = compress the sublog files, either "gz", "bz2" or "xz".
+            The buffered log entries are compressed in a thread pool.
+        vectorized = split the memory mapped log file in blocks with NumPy.
+            Requires the fixed width date format, like the default one,
+            with the timestamp at the start of the log entry. The log
+            entries, not matching it, are split by the regular engine.
+        profiler = the profiler, like cProfile.Profile, enabled
+            for the time of every division. Any object with the enable
+            and disable methods will do.
+        coarse_levels = how the sublog files of the coarser split levels
+            are made, when several levels are split at once. "write"
+            writes every log entry to every level. "copy" writes only
+            the finest level, and concatenates its files in chronological
+            order into the coarser ones, with copy_file_range where
+            the system supports it. "manifest" writes only the finest level,
+            and lists its files for every coarser sublog file in
+            the manifest file, like "2019.log.manifest", instead.
+            Unless the log file is time ordered, the log entries of
+            the coarser sublog files are ordered by their finest sublog
+            files first, then by their order in the log file.
+            The follow_log_file method always writes every level.
+        sink = pass the split log entries to the sink, instead of writing
+            them to the sublog files. The sink is any object with
+            the write(bucket, chunks) method, see the FileSink.
+            The buckets are named by the sublog files, relative
+            to the output folder, like "2019/Jan/01.log".
+            Can not be combined with the workers and the coarse_levels,
+            made of the sublog files.
+
+        The compressed log files, detected by their extension or contents,
+        are read as a stream, line by line. The features relying on the
+        memory mapped log file (sorted_input, workers, resume, the time
+        index) do not apply to them.
         """
-        if custom_formats:
+        if custom_formats and custom_formats != "auto":
             self.date_frm = custom_formats
 
+        if compression and compression not in COMPRESSION_FORMATS:
+            raise ValueError(f"Unknown compression format {compression!r}.")
+        if coarse_levels not in ("write", "copy", "manifest"):
+            raise ValueError(
+                f"Unknown coarse levels mode {coarse_levels!r}.")
+
         self.log_file_path = log_file_path
+        self.input_compression = detect_compression(log_file_path)
         self.filename, _ = os.path.splitext(log_file_path)
-        self.log_subfiles = defaultdict(str)
+        if self.input_compression:
+            self.filename, _ = os.path.splitext(self.filename)
+        self.compression = compression
+        self.coarse_levels = coarse_levels
+        self.sink = sink
+        self.vectorized = vectorized
+        self.binary_mode = binary_mode
+        self.sorted_input = sorted_input
+        self.workers = workers
+        self.resume = resume
+        self.max_open_files = max_open_files
+        self.log_subfiles = FileHandlePool(max_open_files,
+            self._get_sublog_file_mode())
+        self.memory_budget = memory_budget
+        self.sublog_writer = SublogWriter(self.log_subfiles, memory_budget)
+        self._sublog_suffix = f".log.{compression}" if compression else ".log"
         self.save_folder_path = save_folder_path
+        self._checked_subfiles = set()
+
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._subfile_names_cache = OrderedDict()
+        self._output_folder = None
+        self.log_file = self._open_log_file(self.log_file_path)
+
+        if custom_formats == "auto":
+            self.date_frm = DATE_FORMAT.detect(
+                islice(self.log_file, self.sniff_lines))
+            self.log_file.seek(0)
+            logger.debug(f"Detected date format: {self.date_frm!r}.")
+
+        self.profiler = profiler
+        self._profiling = False
+        if sink is not None:
+            self._check_sink_options()
+        self.stats = DivisionStats()
+        self._bucket_lines = Counter()
+        self._division_started = 0.0
+        self._progress = None
+        self._progress_total = self._progress_done = 0
+
+        self._vectorized_names = dict()
+        if vectorized:
+            if numpy is None:
+                raise ImportError("The vectorized division requires NumPy.")
 
+            self._fixed_width_layout = self.date_frm.get_fixed_width_layout()
+            if self._fixed_width_layout is None:
+                raise ValueError(f"The date format {self.date_frm!r} "
+                    "has no fixed width, it can not be vectorized.")
+
+    def _open_log_file(self, log_file_path):
+        compression = detect_compression(log_file_path)
+        open_file = COMPRESSION_FORMATS[compression][0] if compression \
+            else open
         try:
-            self.log_file = open(self.log_file_path, "r")
+            return open_file(log_file_path,
+                "rb" if self.binary_mode else ("rt" if compression else "r"))
         except OSError as exception:
             log_message = textwrap.dedent(f"""\
                 The program experienced an error: {exception.strerror},
-                While trying to open the file \"{self.log_file_path}\".
+                While trying to open the file \"{log_file_path}\".
                 {"="*80}""")
 
             logger.error(log_message, exc_info=True)
             exit(1)
         except Exception as exception:
-            logger.error(f"Unknown exception occurred: {exc.strerror}", 
+            logger.error(f"Unknown exception occurred: {exception}", 
                 exc_info=True)
             exit(1)
 
-    def _get_subfile_name(self, line, wiseness):
-        match = self.date_frm.re.search(line)
-        if match:
-            matchDate = match.group(1)
-            try:
-                dt = datetime.strptime(matchDate, self.date_frm.strp)
-            except ValueError:
-                return self._get_corrupt_entries_file_path()
+    @property
+    def cache_hit_rate(self):
+        """
+        The share of log entries, whose sublog file names
+        were taken from the dates cache during the last division.
+        """
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def _get_subfile_names(self, line, wiseness):
+        """
+        Returns the tuple of the sublog file names, the line belongs to,
+        for every split level of the wiseness.
+        The timestamp is parsed only once for each date,
+        following entries of the same date are served from the cache.
+        On the cache hit only the time fields of the timestamp are
+        range checked, the date part is known to be valid.
+        """
+        if self.binary_mode:
+            match = self.date_frm.bytes_re.search(line)
+        else:
+            match = self.date_frm.re.search(line)
+        if not match:
+            return (self._get_corrupt_entries_file_path(),)
 
-            base_name = self._get_base_name(dt, wiseness)
+        key = self.date_frm.date_key(match)
+        cache = self._subfile_names_cache
+        subfile_names = cache.get(key)
+        if subfile_names is not None:
+            self.cache_hits += 1
+            cache.move_to_end(key)
+            if not self.date_frm.valid_time(match):
+                return (self._get_corrupt_entries_file_path(),)
+            return subfile_names
 
-            if self.save_folder_path:
-                subfile_name = f"{self.save_folder_path}/{base_name}.log"
-            else:
-                if os.path.isfile(self.filename):
-                    subfile_name = f"{self.filename}_divided/{base_name}.log"
-                else:
-                    subfile_name = f"{self.filename}/{base_name}.log"
+        self.cache_misses += 1
+        dt = self.date_frm.extract_timestamp(match)
+        if dt is None:
+            return (self._get_corrupt_entries_file_path(),)
+
+        subfile_names = tuple(
+            f"{self._output_folder}/{self._get_base_name(dt, level)}"
+            f"{self._sublog_suffix}"
+            for level in (WISENESS.Y, WISENESS.M, WISENESS.D)
+            if wiseness & level == level)
 
-            return subfile_name
+        cache[key] = subfile_names
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+        return subfile_names
+
+    def _get_sublog_file_mode(self):
+        return "wb" if self.binary_mode or self.compression else "w"
+
+    def _get_line_timestamp(self, line):
+        """
+        Returns the timestamp of the log entry, or None for the corrupt entry.
+        """
+        if self.binary_mode:
+            match = self.date_frm.bytes_re.search(line)
         else:
-            return self._get_corrupt_entries_file_path()
+            match = self.date_frm.re.search(line)
+        if not match:
+            return None
+
+        return self.date_frm.extract_timestamp(match)
+
+    def _get_output_folder(self):
+        if self.save_folder_path:
+            return self.save_folder_path
+        if os.path.isfile(self.filename):
+            return f"{self.filename}_divided"
+        return self.filename
 
     def _get_base_name(self, dt, wiseness):
         if wiseness == WISENESS.Y:
@@ -154,23 +1233,16 @@ class LogDivisor(object):
         return base_name
 
     def _get_corrupt_entries_file_path(self):
-        if self.save_folder_path:
-            subfile_name = f"{self.save_folder_path}/corrupt_log_entries.log"
-        else:
-            if os.path.isfile(self.filename):
-                subfile_name = f"{self.filename}_divided/corrupt_log_entries.log"
-            else:
-                subfile_name = f"{self.filename}/corrupt_log_entries.log"
-        
-        return subfile_name
+        return f"{self._output_folder}/corrupt_log_entries{self._sublog_suffix}"
 
-    def _check_directory(_, subfile_name):
+    def _check_directory(self, subfile_name):
         folder_name = os.path.split(subfile_name)[0]
 
+        started = time.perf_counter()
         try:
             if not os.path.isdir(folder_name):
                 os.makedirs(folder_name)
-        except OSError:
+        except OSError as exception:
             log_message = textwrap.dedent(f"""\
                 The program experienced an error: {exception.strerror},
                 While trying to make directories \"{folder_name}\".
@@ -179,84 +1251,1150 @@ class LogDivisor(object):
             logger.error(log_message, exc_info=True)
             exit(1)
         except Exception as exception:
-            logger.error(f"Unknown exception occurred: {exc.strerror}", 
+            logger.error(f"Unknown exception occurred: {exception}", 
                 exc_info=True)
             exit(1)
+        self.stats.add_time("directories", time.perf_counter() - started)
 
-    def _divide_file(self, wiseness):
-        for line in self.log_file:
-            files_to_write = set()
-            if wiseness & WISENESS.Y == WISENESS.Y:
-                files_to_write.add(self._get_subfile_name(line, WISENESS.Y))
-            if wiseness & WISENESS.M == WISENESS.M:
-                files_to_write.add(self._get_subfile_name(line, WISENESS.M))
-            if wiseness & WISENESS.D == WISENESS.D:
-                files_to_write.add(self._get_subfile_name(line, WISENESS.D))
-
-            self._write_to_sublog_files(files_to_write, line)
+    @contextmanager
+    def _map_log_file(self, log_file = None):
+        """
+        Memory maps the log file for reading.
+        The buffered sublog entries, being the views of the map,
+        must be flushed before the map is closed.
+        """
+        log_file = log_file or self.log_file
+        if os.fstat(log_file.fileno()).st_size == 0:
+            yield b""
+            return
 
-        else:
-            self.log_file.seek(0)
+        log_map = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield log_map
+        finally:
+            self.sublog_writer.clear()
+            try:
+                log_map.close()
+            except BufferError:
+                # The views are still referenced by a propagating exception,
+                # the map is closed once they are garbage collected.
+                pass
 
-            for key, file in list(self.log_subfiles.items()):
-                file.close()
-                self.log_subfiles.pop(key)
+    def _iter_lines(self, log_map, start, end):
+        """
+        Yields the lines of the mapped log file between the byte offsets,
+        as memoryview slices of the map, or decoded strings in text mode.
+        """
+        view = memoryview(log_map)
+        find = log_map.find
+        encoding = None if self.binary_mode else self.log_file.encoding
+        while start < end:
+            stop = find(b"\n", start, end) + 1 or end
+            if encoding:
+                yield str(view[start:stop], encoding)
+            else:
+                yield view[start:stop]
+            start = stop
 
-    def _write_to_sublog_files(self, files_to_write, line):
-        for subfile_name in files_to_write:
-            self._check_directory(subfile_name)
-            if not self.log_subfiles[subfile_name]:
-                self.log_subfiles[subfile_name] = open(subfile_name, "w+")
+    def _get_line_date(self, log_map, start, end):
+        """
+        Returns the (year, month, day) of the log entry,
+        starting at the byte offset, or None for the corrupt entry.
+        """
+        stop = log_map.find(b"\n", start, end) + 1 or end
+        match = self.date_frm.bytes_re.search(log_map, start, stop)
+        dt = match and self.date_frm.extract_timestamp(match)
+        if not dt:
+            return None
 
-            self.log_subfiles[subfile_name].write(line)
+        return (dt.year, dt.month, dt.day)
 
-    def divide_log_file(self, save_folder_path = None):
+    def _divide_sorted(self, log_map, start, end, wiseness):
         """
-        The default method.
-        The purpose is to split a large log file into smaller log files,
-        yearly, monthly and daily-wise.
+        Splits the time ordered log file, copying every sublog file
+        as a single byte range wherever possible.
         """
-        if save_folder_path:
-            self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.YMD)
+        if wiseness & WISENESS.D == WISENESS.D:
+            key_length = 3
+        elif wiseness & WISENESS.M == WISENESS.M:
+            key_length = 2
+        else:
+            key_length = 1
 
-    def divide_year_and_month_wise(self, save_folder_path = None):
+        pending_names, pending_start, pending_end = None, 0, 0
+        for start, end, uniform in self._find_sorted_ranges(
+                log_map, start, end, key_length):
+            if uniform:
+                line = next(self._iter_lines(log_map, start, end))
+                subfile_names = self._get_subfile_names(line, wiseness)
+                if subfile_names == pending_names and start == pending_end:
+                    pending_end = end
+                    continue
+
+            if pending_names:
+                self._copy_to_sublog_files(log_map, pending_names,
+                    pending_start, pending_end)
+                pending_names = None
+
+            if uniform:
+                pending_names, pending_start, pending_end = \
+                    subfile_names, start, end
+            else:
+                self._divide_lines(
+                    self._iter_lines(log_map, start, end), wiseness)
+
+        if pending_names:
+            self._copy_to_sublog_files(log_map, pending_names,
+                pending_start, pending_end)
+
+    def _find_sorted_ranges(self, log_map, start, end, key_length):
+        """
+        Yields (start, end, uniform) byte ranges of the log file in order.
+        The uniform ranges hold the valid entries of a single sublog file,
+        the rest must be split line by line. The ranges with the corrupt
+        or out of order entries are bisected further, down to the ranges
+        of min_sorted_range bytes.
+        """
+        if start >= end:
+            return
+
+        first_date = self._get_line_date(log_map, start, end)
+        last_start = log_map.rfind(b"\n", start, end - 1) + 1
+        last_start = max(last_start, start)
+        last_date = self._get_line_date(log_map, last_start, end)
+
+        if first_date and last_date:
+            if first_date[:key_length] == last_date[:key_length]:
+                with self.stats.timer("read"):
+                    uniform = self._is_uniform_range(log_map, start, end,
+                        key_length, first_date)
+                if uniform or end - start <= self.min_sorted_range:
+                    yield start, end, uniform
+                    return
+            elif first_date > last_date:
+                yield start, end, False
+                return
+
+        middle = (start + end) // 2
+        newline = log_map.find(b"\n", middle, end - 1)
+        if newline < 0:
+            newline = log_map.rfind(b"\n", start, middle)
+        if newline < 0:
+            yield start, end, False
+            return
+
+        yield from self._find_sorted_ranges(log_map, start, newline + 1,
+            key_length)
+        yield from self._find_sorted_ranges(log_map, newline + 1, end,
+            key_length)
+
+    def _is_uniform_range(self, log_map, start, end, key_length, date):
+        """
+        Returns whether every line of the byte range holds the valid
+        timestamp of the same sublog file as the (year, month, day) date,
+        so that the range may be copied as a whole.
+        """
+        regex = self.date_frm.get_bucket_lines_regex(key_length)
+        if regex is None:
+            return self._is_uniform_range_by_lines(log_map, start, end,
+                key_length, date)
+
+        buckets = set()
+        for block_start, block_end in self._iter_blocks(log_map, start, end,
+                16 * 2**20):
+            found = regex.findall(log_map, block_start, block_end)
+            if len(found) != self._count_lines(log_map, block_start,
+                    block_end):
+                return False
+
+            buckets.update(found)
+            if len(buckets) > 1:
+                return False
+
+        return True
+
+    def _is_uniform_range_by_lines(self, log_map, start, end, key_length,
+            date):
+        """
+        The _is_uniform_range for the date formats without the bucket
+        lines regex, checking the timestamps one by one.
+        """
+        lines = 0
+        dates = dict()
+        date_frm = self.date_frm
+        for match in date_frm.bytes_lines_re.finditer(log_map, start, end):
+            if not date_frm.valid_time(match):
+                return False
+
+            key = date_frm.date_key(match)
+            if key not in dates:
+                dt = date_frm.extract_timestamp(match)
+                dates[key] = dt and (dt.year, dt.month, dt.day)[:key_length]
+            if dates[key] != date[:key_length]:
+                return False
+            lines += 1
+
+        return lines == self._count_lines(log_map, start, end)
+
+    def _copy_to_sublog_files(self, log_map, subfile_names, start, end):
+        with self.stats.timer("read"):
+            self._bucket_lines[subfile_names] += self._count_lines(
+                log_map, start, end)
+
+        block_size = self.memory_budget
+        if self.sink is not None:
+            block_size = min(block_size,
+                getattr(self.sink, "batch_size", block_size))
+
+        for subfile_name in subfile_names:
+            if subfile_name not in self._checked_subfiles:
+                if self.sink is None:
+                    self._check_directory(subfile_name)
+                self._checked_subfiles.add(subfile_name)
+
+            with self.stats.timer("write"):
+                if self.compression or self.sink is not None:
+                    for block_start, block_end in self._iter_blocks(log_map,
+                            start, end, block_size):
+                        self.sublog_writer.write(subfile_name,
+                            self._get_block_chunk(
+                                memoryview(log_map)[block_start:block_end]))
+                    continue
+
+                self.sublog_writer.flush(subfile_name)
+                handle = self.log_subfiles.get(subfile_name)
+                handle.flush()
+                self._copy_file_range(self.log_file, handle, start, end)
+
+    @staticmethod
+    def _count_lines(log_map, start, end, block_size = 16 * 2**20):
+        """
+        Counts the lines of the byte range of the mapped log file.
+        """
+        lines = 0
+        for block_start in range(start, end, block_size):
+            lines += log_map[block_start:min(block_start + block_size, end)] \
+                .count(b"\n")
+        if end > start and log_map[end - 1:end] != b"\n":
+            lines += 1
+        return lines
+
+    def _copy_file_range(self, source_file, handle, start, end):
+        """
+        Appends the byte range of the source file to the open sublog file,
+        with copy_file_range or sendfile system calls, when possible.
+        """
+        source, destination = source_file.fileno(), handle.fileno()
+        copy_calls = list()
+        if hasattr(os, "copy_file_range"):
+            copy_calls.append(lambda offset, count:
+                os.copy_file_range(source, destination, count, offset))
+        if hasattr(os, "sendfile"):
+            copy_calls.append(lambda offset, count:
+                os.sendfile(destination, source, offset, count))
+
+        for copy_call in copy_calls:
+            try:
+                while start < end:
+                    copied = copy_call(start, end - start)
+                    if not copied:
+                        break
+                    start += copied
+            except OSError:
+                continue
+            if start >= end:
+                return
+
+        raw_source = getattr(source_file, "buffer", source_file)
+        raw_handle = getattr(handle, "buffer", handle)
+        raw_source.seek(start)
+        while start < end:
+            chunk = raw_source.read(min(end - start, 2**20))
+            if not chunk:
+                break
+            raw_handle.write(chunk)
+            start += len(chunk)
+        raw_handle.flush()
+
+    def _divide_lines(self, lines, wiseness):
+        """
+        Splits the lines one by one. The parsing of the timestamps
+        and the writing are timed apart, the rest is taken by the reading.
+        """
+        perf_counter = time.perf_counter
+        bucket_lines = self._bucket_lines
+        timings = self.stats.timings
+        directories_time = timings.get("directories", 0.0)
+        parse_time = write_time = 0.0
+        started = perf_counter()
+        for line in lines:
+            line_started = perf_counter()
+            files_to_write = self._get_subfile_names(line, wiseness)
+            parsed = perf_counter()
+            self._write_to_sublog_files(files_to_write, line)
+            write_time += perf_counter() - parsed
+            parse_time += parsed - line_started
+            bucket_lines[files_to_write] += 1
+
+        elapsed = perf_counter() - started
+        directories_time = timings.get("directories", 0.0) - directories_time
+        self.stats.add_time("read", elapsed - parse_time - write_time)
+        self.stats.add_time("parse", parse_time)
+        self.stats.add_time("write", write_time - directories_time)
+
+    def _flush_sublog_files(self):
+        with self.stats.timer("write"):
+            self.sublog_writer.flush_all()
+
+    def _start_division(self, append = False):
+        self._output_folder = self._get_output_folder()
+        self._subfile_names_cache.clear()
+        self.cache_hits = self.cache_misses = 0
+        mode = self._get_sublog_file_mode()
+        if append:
+            mode = mode.replace("w", "a")
+        self.log_subfiles = FileHandlePool(self.max_open_files, mode)
+        if self.sink is None:
+            sink = FileSink(self.log_subfiles)
+        else:
+            sink = _BucketSink(self.sink, self._output_folder)
+        if self.compression:
+            self.sublog_writer = CompressingSublogWriter(sink,
+                self.memory_budget, self.compression,
+                getattr(self.log_file, "encoding", None))
+        else:
+            self.sublog_writer = SublogWriter(sink, self.memory_budget)
+        self._checked_subfiles.clear()
+        self._vectorized_names.clear()
+        self.stats = DivisionStats()
+        self._bucket_lines.clear()
+        self._division_started = time.perf_counter()
+
+    def _finish_division(self):
+        with self.stats.timer("write"):
+            self.sublog_writer.close()
+            self.log_subfiles.close()
+
+        stats = self.stats
+        for subfile_names, lines in self._bucket_lines.items():
+            stats.lines_read += lines
+            for subfile_name in subfile_names:
+                name = os.path.relpath(subfile_name, self._output_folder)
+                stats.bucket_lines[name] = \
+                    stats.bucket_lines.get(name, 0) + lines
+        stats.corrupt_lines += self._bucket_lines.get(
+            (self._get_corrupt_entries_file_path(),), 0)
+        self._bucket_lines.clear()
+        stats.files_opened += self.log_subfiles.opened
+        stats.files_evicted += self.log_subfiles.evicted
+        stats.files_reopened += self.log_subfiles.reopened
+        stats.elapsed = time.perf_counter() - self._division_started
+
+        logger.debug(f"Dates cache hit rate: {self.cache_hit_rate:.2%} "
+            f"({self.cache_hits} hits, {self.cache_misses} misses).")
+        logger.debug(f"Sublog files opened: {self.log_subfiles.opened}, "
+            f"evicted: {self.log_subfiles.evicted}, "
+            f"reopened: {self.log_subfiles.reopened}.")
+
+    def _divide_range(self, start, end, wiseness):
+        """
+        Splits the byte range of the memory mapped log file.
+        The end of None stands for the end of the log file.
+        """
+        with self._map_log_file() as log_map:
+            if end is None:
+                end = len(log_map)
+            self.stats.bytes_read += end - start
+
+            blocks = ((start, end),)
+            if self._progress:
+                blocks = self._iter_blocks(log_map, start, end,
+                    self.progress_interval)
+
+            for block_start, block_end in blocks:
+                if self.vectorized:
+                    self._divide_vectorized(log_map, block_start, block_end,
+                        wiseness)
+                elif self.sorted_input:
+                    self._divide_sorted(log_map, block_start, block_end,
+                        wiseness)
+                else:
+                    self._divide_lines(self._iter_lines(log_map,
+                        block_start, block_end), wiseness)
+                self._report_progress(block_end)
+            self._flush_sublog_files()
+
+    @staticmethod
+    def _iter_blocks(log_map, start, end, block_size):
+        """
+        Yields the newline aligned (start, end) blocks of the byte range
+        of the log file, of about block_size bytes.
+        """
+        while start < end:
+            block_end = start + block_size
+            newline = log_map.find(b"\n", block_end - 1, end) \
+                if block_end < end else -1
+            block_end = newline + 1 if newline >= 0 else end
+
+            yield start, block_end
+            start = block_end
+
+    def _divide_vectorized(self, log_map, start, end, wiseness):
+        """
+        Splits the byte range of the log file in the newline aligned blocks
+        of about vectorized_block_size bytes.
+        """
+        for block_start, block_end in self._iter_blocks(log_map, start, end,
+                self.vectorized_block_size):
+            self._divide_block(log_map, block_start, block_end, wiseness)
+
+    def _divide_block(self, log_map, start, end, wiseness):
+        """
+        Splits the block of the log file at once. The timestamps at the
+        starts of the lines are decoded as the columns of digits, and the
+        lines are grouped by their sublog files with a single gather
+        for every split level. The lines, not matching the fixed width
+        layout, are resolved one by one, by the date format regex.
+        """
+        started = time.perf_counter()
+        fields, literals, width = self._fixed_width_layout
+        data = numpy.frombuffer(log_map, numpy.uint8, end - start, start)
+
+        line_ends = numpy.flatnonzero(data == ord("\n")) + 1
+        if not len(line_ends) or line_ends[-1] != len(data):
+            line_ends = numpy.append(line_ends, len(data))
+        line_starts = numpy.concatenate(([0], line_ends[:-1]))
+        line_lengths = line_ends - line_starts
+
+        positions = line_starts[:, None] + numpy.arange(width + 1)
+        columns = data[numpy.minimum(positions, len(data) - 1)]
+        digits = columns.astype(numpy.int64) - ord("0")
+        is_digit = (digits >= 0) & (digits <= 9)
+
+        valid = (line_lengths >= width) & ((line_lengths == width)
+            | ~is_digit[:, width])
+        for offset, character in literals:
+            valid &= columns[:, offset] == character
+
+        values = dict()
+        for directive, offset in fields.items():
+            field_width = _FIXED_WIDTHS[directive]
+            valid &= is_digit[:, offset:offset + field_width].all(axis=1)
+            values[directive] = digits[:, offset:offset + field_width] \
+                @ 10 ** numpy.arange(field_width - 1, -1, -1)
+
+        year, month, day = values["Y"], values["m"], values["d"]
+        leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = numpy.array((0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31,
+            30, 31))[numpy.clip(month, 0, 12)] + (leap_year & (month == 2))
+        valid &= (month >= 1) & (month <= 12) & (day >= 1) \
+            & (day <= month_days)
+        for directive, limit in (("H", 24), ("M", 60), ("S", 60)):
+            if directive in values:
+                valid &= values[directive] < limit
+
+        resolved = valid.copy()
+        for line in numpy.flatnonzero(~valid):
+            match = self.date_frm.bytes_re.search(log_map,
+                start + line_starts[line], start + line_ends[line])
+            dt = match and self.date_frm.extract_timestamp(match)
+            if dt:
+                year[line], month[line], day[line] = dt.year, dt.month, dt.day
+                resolved[line] = True
+
+        corrupt_lines = numpy.flatnonzero(~resolved)
+        resolved_lines = numpy.flatnonzero(resolved)
+        levels = ((WISENESS.Y, year), (WISENESS.M, year * 100 + month),
+            (WISENESS.D, (year * 100 + month) * 100 + day))
+        levels = [(level, codes) for level, codes in levels
+            if wiseness & level == level]
+        self._count_block_lines(levels, resolved_lines, corrupt_lines)
+        parsed = time.perf_counter()
+        self.stats.add_time("parse", parsed - started)
+
+        if len(corrupt_lines):
+            lines, _ = self._gather_lines(data, line_starts, line_lengths,
+                corrupt_lines)
+            self._write_to_sublog_files(
+                (self._get_corrupt_entries_file_path(),),
+                self._get_block_chunk(lines))
+
+        for level, codes in levels:
+            if not len(resolved_lines):
+                continue
+
+            order = resolved_lines[
+                numpy.argsort(codes[resolved_lines], kind="stable")]
+            lines, line_offsets = self._gather_lines(data, line_starts,
+                line_lengths, order)
+            sorted_codes = codes[order]
+            bucket_starts = numpy.flatnonzero(numpy.diff(sorted_codes)) + 1
+            bucket_bounds = numpy.concatenate(
+                ([0], line_offsets[bucket_starts - 1], [len(lines)]))
+
+            for bucket, code in enumerate(sorted_codes[
+                    numpy.concatenate(([0], bucket_starts))].tolist()):
+                self._write_to_sublog_files(
+                    (self._get_vectorized_name(level, code),),
+                    self._get_block_chunk(lines[
+                        bucket_bounds[bucket]:bucket_bounds[bucket + 1]]))
+        self.stats.add_time("write", time.perf_counter() - parsed)
+
+    def _count_block_lines(self, levels, resolved_lines, corrupt_lines):
+        """
+        Counts the lines of the block by the tuples of their sublog files,
+        like the lines split one by one.
+        """
+        if len(corrupt_lines):
+            self._bucket_lines[(self._get_corrupt_entries_file_path(),)] += \
+                len(corrupt_lines)
+        if not levels or not len(resolved_lines):
+            return
+
+        # The codes of the finest level hold the codes of the coarser ones,
+        # two decimal digits less for every level.
+        finest_level, finest_codes = levels[-1]
+        depths = {WISENESS.Y: 0, WISENESS.M: 1, WISENESS.D: 2}
+        codes, counts = numpy.unique(finest_codes[resolved_lines],
+            return_counts=True)
+        for code, lines in zip(codes.tolist(), counts.tolist()):
+            self._bucket_lines[tuple(self._get_vectorized_name(level,
+                code // 100 ** (depths[finest_level] - depths[level]))
+                for level, _ in levels)] += lines
+
+    @staticmethod
+    def _gather_lines(data, line_starts, line_lengths, order):
+        """
+        Returns the lines of the block in the order, concatenated,
+        and the offsets of their ends.
+        """
+        lengths = line_lengths[order]
+        ends = numpy.cumsum(lengths)
+        if (numpy.diff(order) == 1).all():
+            first_start = line_starts[order[0]]
+            return data[first_start:first_start + ends[-1]].copy(), ends
+
+        index = numpy.repeat(line_starts[order] - (ends - lengths), lengths)
+        index += numpy.arange(len(index))
+        return data[index], ends
+
+    def _get_block_chunk(self, lines):
+        if self.binary_mode or self.compression:
+            return lines
+        return lines.tobytes().decode(self.log_file.encoding)
+
+    def _get_vectorized_name(self, level, code):
+        name = self._vectorized_names.get((level, code))
+        if name is None:
+            if level == WISENESS.Y:
+                dt = date(code, 1, 1)
+            elif level == WISENESS.M:
+                dt = date(code // 100, code % 100, 1)
+            else:
+                dt = date(code // 10000, code // 100 % 100, code % 100)
+
+            name = f"{self._output_folder}/{self._get_base_name(dt, level)}" \
+                f"{self._sublog_suffix}"
+            self._vectorized_names[(level, code)] = name
+        return name
+
+    def _divide(self, wiseness, progress = None):
+        """
+        Splits the log file, reporting the progress of the division
+        and profiling it, when required. Returns the DivisionStats.
+        """
+        self._progress = progress
+        self._progress_total = self._get_log_size()
+        self._progress_done = 0
+        try:
+            with self._profile():
+                written_wiseness = self._get_written_wiseness(wiseness)
+                self._divide_file(written_wiseness)
+                if written_wiseness != wiseness:
+                    self._assemble_coarse_levels(wiseness)
+            self._report_progress(self._progress_total)
+        finally:
+            self._progress = None
+
+        return self.stats
+
+    def _get_written_wiseness(self, wiseness):
+        """
+        Returns the split levels of the wiseness, written by the division.
+        """
+        if self.coarse_levels == "write":
+            return wiseness
+
+        for level in (WISENESS.D, WISENESS.M, WISENESS.Y):
+            if wiseness & level == level:
+                return level
+
+    def _assemble_coarse_levels(self, wiseness):
+        """
+        Makes the sublog files of the coarser split levels of the wiseness
+        of the finest level sublog files, in chronological order.
+        Every coarser sublog file is made of the already made sublog files
+        of the next finer level, either concatenating them, or listing
+        the finest sublog files in the manifest.
+        """
+        started = time.perf_counter()
+        levels = [level for level in (WISENESS.D, WISENESS.M, WISENESS.Y)
+            if wiseness & level == level]
+        key_lengths = {WISENESS.Y: 1, WISENESS.M: 2, WISENESS.D: 3}
+        bucket_lines = self.stats.bucket_lines
+
+        names = self._get_finest_sublog_names(key_lengths[levels[0]])
+        finest_names = {key: [name] for key, name in names.items()}
+        for level in levels[1:]:
+            key_length = key_lengths[level]
+            sources = dict()
+            for key in sorted(names):
+                sources.setdefault(key[:key_length], list()).append(key)
+
+            coarse_names = dict()
+            for coarse_key, keys in sources.items():
+                dt = date(*coarse_key, *(1,) * (3 - key_length))
+                name = os.path.normpath(
+                    f"{self._get_base_name(dt, level)}{self._sublog_suffix}")
+                finest_names[coarse_key] = [finest_name for key in keys
+                    for finest_name in finest_names[key]]
+
+                if self.coarse_levels == "manifest":
+                    self._write_manifest(name, finest_names[coarse_key])
+                else:
+                    self._concatenate_sublog_files(name,
+                        [names[key] for key in keys])
+                    bucket_lines[name] = sum(bucket_lines.get(names[key], 0)
+                        for key in keys)
+                coarse_names[coarse_key] = name
+            names = coarse_names
+
+        elapsed = time.perf_counter() - started
+        self.stats.add_time("assemble", elapsed)
+        self.stats.elapsed += elapsed
+
+    def _get_finest_sublog_names(self, key_length):
+        """
+        Returns the sublog file names of the finest level,
+        relative to the output folder, keyed by their (year, month, day)
+        date parts. In resume mode, the sublog files split before
+        are found in the output folder as well.
+        """
+        names = set(self.stats.bucket_lines)
+        if self.resume:
+            for root, _, files in os.walk(self._output_folder):
+                names.update(os.path.relpath(os.path.join(root, name),
+                    self._output_folder) for name in files)
+
+        month_numbers = {date(2000, month, 1).strftime('%b'): month
+            for month in range(1, 13)}
+        finest_names = dict()
+        for name in names:
+            parts = name.split(os.sep)
+            if len(parts) != key_length \
+                    or not parts[-1].endswith(self._sublog_suffix):
+                continue
+
+            parts[-1] = parts[-1][:-len(self._sublog_suffix)]
+            try:
+                key = (int(parts[0]),) + tuple(month_numbers[part]
+                    for part in parts[1:2]) + tuple(map(int, parts[2:]))
+            except (KeyError, ValueError):
+                continue
+            finest_names[key] = name
+
+        return finest_names
+
+    def _concatenate_sublog_files(self, name, source_names):
+        with open(os.path.join(self._output_folder, name), "wb") as handle:
+            self.stats.files_opened += 1
+            for source_name in source_names:
+                with open(os.path.join(self._output_folder, source_name),
+                        "rb") as source_file:
+                    self._copy_file_range(source_file, handle, 0,
+                        os.fstat(source_file.fileno()).st_size)
+
+    def _write_manifest(self, name, source_names):
+        manifest_name = os.path.join(self._output_folder, f"{name}.manifest")
+        with open(manifest_name, "w") as manifest_file:
+            manifest_file.writelines(f"{source_name.replace(os.sep, '/')}\n"
+                for source_name in source_names)
+
+    @contextmanager
+    def _profile(self):
+        if self.profiler is None or self._profiling:
+            yield
+            return
+
+        self._profiling = True
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            self._profiling = False
+
+    def _call_profiled(self, function, *args):
+        with self._profile():
+            return function(*args)
+
+    def _report_progress(self, done):
+        if self._progress and done > self._progress_done:
+            self._progress_done = done
+            self._progress(done, self._progress_total)
+
+    def _track_progress(self, lines, get_done = None):
+        """
+        Yields the lines, reporting the progress about every
+        progress_interval bytes. The amount of the processed bytes
+        is counted by the lengths of the lines, or returned by get_done,
+        like the read offset of the compressed log file.
+        """
+        counted, next_report = 0, self.progress_interval
+        for line in lines:
+            yield line
+            counted += len(line)
+            if counted >= next_report:
+                next_report += self.progress_interval
+                self._report_progress(min(get_done() if get_done
+                    else counted, self._progress_total))
+
+    def _get_read_offset(self):
+        return os.lseek(self.log_file.fileno(), 0, os.SEEK_CUR)
+
+    def _divide_file(self, wiseness):
+        start, end, append = 0, None, False
+        if self.resume and not self.input_compression:
+            start, append = self._get_resume_offset(wiseness)
+            end = self._get_complete_lines_end()
+
+        if self.workers > 1 and not self.input_compression:
+            self._divide_parallel(wiseness, start, end, append)
+        else:
+            self._start_division(append)
+            try:
+                if not self.input_compression and (self.binary_mode
+                        or self.sorted_input or self.resume
+                        or self.vectorized):
+                    self._divide_range(start, end, wiseness)
+                else:
+                    self.stats.bytes_read += self._get_log_size()
+                    lines = self.log_file
+                    if self._progress:
+                        lines = self._track_progress(lines,
+                            self.input_compression and self._get_read_offset)
+                    self._divide_lines(lines, wiseness)
+                    self._flush_sublog_files()
+            finally:
+                self.log_file.seek(0)
+                self._finish_division()
+
+        if self.resume and not self.input_compression:
+            self._write_checkpoint(end, wiseness)
+
+    def _get_checkpoint_path(self):
+        return f"{self._get_output_folder()}/.log_divisor_checkpoint"
+
+    def _read_checkpoint(self):
+        try:
+            with open(self._get_checkpoint_path(), "r") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_checkpoint(self, offset, wiseness):
+        """
+        Saves the offset of the processed part of the log file,
+        along with the inode and the size of the log file,
+        detecting its rotation and truncation.
+        """
+        stat = os.fstat(self.log_file.fileno())
+        checkpoint_path = self._get_checkpoint_path()
+        self._check_directory(checkpoint_path)
+
+        with open(f"{checkpoint_path}.tmp", "w") as checkpoint_file:
+            json.dump(dict(offset=offset, inode=stat.st_ino,
+                size=stat.st_size, wiseness=wiseness.value), checkpoint_file)
+        os.replace(f"{checkpoint_path}.tmp", checkpoint_path)
+
+    def _get_resume_offset(self, wiseness):
+        """
+        Returns the offset to continue the division from,
+        and whether the sublog files must be appended to.
+        """
+        checkpoint = self._read_checkpoint()
+        if not checkpoint or checkpoint.get("wiseness") != wiseness.value:
+            return 0, False
+
+        stat = os.fstat(self.log_file.fileno())
+        if stat.st_ino != checkpoint["inode"] \
+                or stat.st_size < checkpoint["size"]:
+            logger.info(f"The log file \"{self.log_file_path}\" was rotated "
+                "or truncated, splitting it from the start.")
+            return 0, True
+
+        return checkpoint["offset"], True
+
+    def _get_complete_lines_end(self):
+        with self._map_log_file() as log_map:
+            return log_map.rfind(b"\n") + 1
+
+    def follow_log_file(self, save_folder_path = None,
+            wiseness = WISENESS.YMD, poll_interval = 1.0, stop_event = None):
+        """
+        Splits the log file as new entries are appended to it,
+        until the stop event (threading.Event) is set.
+        The division continues from the checkpoint of the previous one.
+        When the log file is rotated, the rest of the old file is split,
+        and the new file at the same path is followed from its start.
+        """
+        if self.input_compression:
+            raise ValueError("The compressed log files can not be followed.")
+
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+
+        start, append = self._get_resume_offset(wiseness)
+        self._start_division(append)
+        try:
+            while not (stop_event and stop_event.is_set()):
+                end = self._get_complete_lines_end()
+                size = os.fstat(self.log_file.fileno()).st_size
+                if size < start:
+                    start = 0
+                    continue
+
+                if end > start:
+                    self._divide_range(start, end, wiseness)
+                    self.log_subfiles.flush()
+                    self._write_checkpoint(end, wiseness)
+                    start = end
+                    continue
+
+                if self._is_log_file_rotated():
+                    if size > start:
+                        self._divide_range(start, size, wiseness)
+                    self.log_file.close()
+                    self.log_file = self._open_log_file(self.log_file_path)
+                    start = 0
+                    self._write_checkpoint(start, wiseness)
+                    continue
+
+                if stop_event:
+                    stop_event.wait(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+        finally:
+            self._finish_division()
+
+    def _is_log_file_rotated(self):
+        try:
+            stat = os.stat(self.log_file_path)
+        except OSError:
+            return False
+
+        return stat.st_ino != os.fstat(self.log_file.fileno()).st_ino
+
+    def _get_index_path(self):
+        return f"{self.log_file_path}.idx"
+
+    def build_index(self):
+        """
+        Builds the sidecar time index of the log file, saved next to it,
+        or updates the existing one with the newly appended log entries.
+        Returns the TimeIndex instance.
+        """
+        if self.input_compression:
+            raise ValueError("The compressed log files can not be indexed.")
+
+        index = TimeIndex.load(self._get_index_path())
+        stat = os.fstat(self.log_file.fileno())
+        if index is None or index.inode != stat.st_ino \
+                or index.size > stat.st_size:
+            index = TimeIndex(stat.st_ino)
+
+        with self._map_log_file() as log_map:
+            end = log_map.rfind(b"\n") + 1
+            if end > index.size:
+                self._index_range(index, log_map, index.size, end)
+                index.size = end
+                index.save(self._get_index_path())
+
+        return index
+
+    def _index_range(self, index, log_map, start, end):
+        find = log_map.find
+        search = self.date_frm.bytes_re.search
+        timestamp, key = None, None
+        while start < end:
+            stop = find(b"\n", start, end) + 1 or end
+            match = search(log_map, start, stop)
+            if match:
+                if match.group(0) != timestamp:
+                    timestamp = match.group(0)
+                    dt = self.date_frm.extract_timestamp(match)
+                    key = TimeIndex.get_key(dt) if dt else None
+                if key is not None:
+                    index.add(key, start)
+            start = stop
+
+    def query(self, start, end):
+        """
+        Yields the log entries, whose timestamps are between start, inclusive,
+        and end, exclusive, without splitting the log file.
+        The times are either datetime instances, or strings
+        in the date format of the log file.
+        Only the ranges of the log file, found by the sidecar time index,
+        are read, along with the unindexed tail of the log file, like its
+        last entry without the trailing newline.
+        The index is built or updated on demand.
+        """
+        if isinstance(start, str):
+            start = self.date_frm.parse(start)
+        if isinstance(end, str):
+            end = self.date_frm.parse(end)
+
+        index = self.build_index()
+        with self._map_log_file() as log_map:
+            for range_start, range_end in chain(index.get_ranges(
+                    TimeIndex.get_key(start), TimeIndex.get_key(end)),
+                    [(index.size, len(log_map))]):
+                for line in self._iter_lines(log_map, range_start, range_end):
+                    timestamp = self._get_line_timestamp(line)
+                    if timestamp and start <= timestamp < end:
+                        yield bytes(line) if self.binary_mode else line
+
+    @classmethod
+    def _get_async_executor(cls):
+        if LogDivisor._async_executor is None:
+            LogDivisor._async_executor = ThreadPoolExecutor(
+                cls.max_concurrent_divisions,
+                thread_name_prefix="log_divisor")
+        return LogDivisor._async_executor
+
+    @classmethod
+    def _get_division_semaphore(cls, loop):
+        semaphore = cls._division_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(cls.max_concurrent_divisions)
+            cls._division_semaphores[loop] = semaphore
+        return semaphore
+
+    def _get_log_size(self):
+        return os.fstat(self.log_file.fileno()).st_size
+
+    def _can_divide_in_blocks(self):
+        return self.workers == 1 and not self.resume \
+            and not self.input_compression
+
+    def _divide_lines_block(self, lines, wiseness):
+        """
+        Splits the next block of the lines, returns the amount of them.
+        """
+        block = list(islice(lines, self.async_block_lines))
+        self._divide_lines(block, wiseness)
+        return len(block)
+
+    async def _divide_file_async(self, wiseness, progress):
+        """
+        Splits the log file in the shared thread pool, block by block.
+        The progress callback, a function or a coroutine function,
+        is called with the amount of the processed and total bytes
+        after every block. Returns the DivisionStats.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_async_executor()
+
+        async def run(function, *args):
+            return await loop.run_in_executor(executor, self._call_profiled,
+                function, *args)
+
+        async def report(done, total):
+            if progress:
+                result = progress(done, total)
+                if inspect.isawaitable(result):
+                    await result
+
+        async with self._get_division_semaphore(loop):
+            total = self._get_log_size()
+            written_wiseness = self._get_written_wiseness(wiseness)
+            if not self._can_divide_in_blocks():
+                await run(self._divide_file, written_wiseness)
+                if written_wiseness != wiseness:
+                    await run(self._assemble_coarse_levels, wiseness)
+                await report(total, total)
+                return self.stats
+
+            await run(self._start_division)
+            try:
+                if self.binary_mode or self.sorted_input or self.vectorized:
+                    offsets = await run(self._get_chunk_offsets,
+                        -(-total // self.async_block_size))
+                    for start, end in zip(offsets, offsets[1:]):
+                        await run(self._divide_range, start, end,
+                            written_wiseness)
+                        await report(end, total)
+                else:
+                    self.stats.bytes_read += total
+                    lines = iter(self.log_file)
+                    while await run(self._divide_lines_block, lines,
+                            written_wiseness):
+                        await report(self.log_file.buffer.tell(), total)
+                    await run(self._flush_sublog_files)
+                    await report(total, total)
+            finally:
+                self.log_file.seek(0)
+                await run(self._finish_division)
+
+            if written_wiseness != wiseness:
+                await run(self._assemble_coarse_levels, wiseness)
+
+        return self.stats
+
+    def _get_chunk_offsets(self, chunks, start = 0, end = None):
+        """
+        Returns the byte offsets, cutting the range of the log file
+        into the newline aligned chunks of about the same size.
+        """
+        with self._map_log_file() as log_map:
+            if end is None:
+                end = len(log_map)
+
+            offsets = [start]
+            for chunk in range(1, chunks):
+                newline = log_map.find(b"\n",
+                    start + (end - start) * chunk // chunks, end)
+                offset = newline + 1 if newline >= 0 else end
+                if offset > offsets[-1]:
+                    offsets.append(offset)
+
+            if end > offsets[-1]:
+                offsets.append(end)
+
+        return offsets
+
+    def _divide_parallel(self, wiseness, start = 0, end = None,
+            append = False):
+        """
+        Splits the log file chunks in the worker processes into the shard
+        files, then concatenates the shards of every sublog file in order.
+        """
+        self._start_division(append)
+        try:
+            offsets = self._get_chunk_offsets(self.workers, start, end)
+            if len(offsets) < 2:
+                return
+
+            self._check_directory(f"{self._output_folder}/")
+            shards_folder = tempfile.mkdtemp(prefix=".shards_",
+                dir=self._output_folder)
+            try:
+                options = dict(
+                    custom_formats=self.date_frm,
+                    cache_size=self.cache_size,
+                    max_open_files=self.max_open_files,
+                    memory_budget=self.memory_budget // self.workers,
+                    binary_mode=True,
+                    sorted_input=self.sorted_input,
+                    compression=self.compression,
+                    vectorized=self.vectorized)
+                shard_folders = [os.path.join(shards_folder, str(chunk))
+                    for chunk in range(len(offsets) - 1)]
+
+                with ProcessPoolExecutor(self.workers) as executor:
+                    for chunk_end, stats in zip(offsets[1:], executor.map(
+                            _divide_log_chunk,
+                            [self.log_file_path] * len(shard_folders),
+                            shard_folders, offsets[:-1], offsets[1:],
+                            [wiseness] * len(shard_folders),
+                            [options] * len(shard_folders))):
+                        self.stats.merge(stats)
+                        self._report_progress(chunk_end)
+
+                with self.stats.timer("merge"):
+                    self._merge_shards(shard_folders)
+            finally:
+                shutil.rmtree(shards_folder, ignore_errors=True)
+        finally:
+            self._finish_division()
+
+    def _merge_shards(self, shard_folders):
+        shard_names = dict()
+        for shard_folder in shard_folders:
+            for root, _, files in os.walk(shard_folder):
+                for name in files:
+                    shard_name = os.path.join(root, name)
+                    relative_name = os.path.relpath(shard_name, shard_folder)
+                    shard_names.setdefault(relative_name, list()).append(
+                        shard_name)
+
+        for relative_name, names in sorted(shard_names.items()):
+            subfile_name = os.path.join(self._output_folder, relative_name)
+            self._check_directory(subfile_name)
+            handle = self.log_subfiles.get(subfile_name)
+            for shard_name in names:
+                with open(shard_name, "rb") as shard_file:
+                    self._copy_file_range(shard_file, handle, 0,
+                        os.fstat(shard_file.fileno()).st_size)
+
+    def _write_to_sublog_files(self, files_to_write, line):
+        for subfile_name in files_to_write:
+            if subfile_name not in self._checked_subfiles:
+                if self.sink is None:
+                    self._check_directory(subfile_name)
+                self._checked_subfiles.add(subfile_name)
+            self.sublog_writer.write(subfile_name, line)
+
+    def divide_log_file(self, save_folder_path = None, progress = None):
+        """
+        The default method.
+        The purpose is to split a large log file into smaller log files,
+        yearly, monthly and daily-wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return self._divide(WISENESS.YMD, progress)
+
+    def divide_year_and_month_wise(self, save_folder_path = None,
+            progress = None):
         """
         Works about the same as the default method,
         yet skips splitting a provided log into daily logs.
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.YM)
+        return self._divide(WISENESS.YM, progress)
 
-    def divide_year_and_day_wise(self, save_folder_path = None):
+    def divide_year_and_day_wise(self, save_folder_path = None,
+            progress = None):
         """
         Works about the same as the default method,
         yet skips splitting a provided log into monthly logs.
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.YD)
+        return self._divide(WISENESS.YD, progress)
 
-    def divide_month_and_day_wise(self, save_folder_path = None):
+    def divide_month_and_day_wise(self, save_folder_path = None,
+            progress = None):
         """
         Works about the same as the default method,
         yet skips splitting a provided log into yearly logs.
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.MD)
+        return self._divide(WISENESS.MD, progress)
 
-    def divide_year_wise(self, save_folder_path = None):
+    def divide_year_wise(self, save_folder_path = None, progress = None):
         """
         Split provided log file into smaller logs,
         each for the individual year represented in the provided log.
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.Y)
+        return self._divide(WISENESS.Y, progress)
 
-    def divide_month_wise(self, save_folder_path = None):
+    def divide_month_wise(self, save_folder_path = None, progress = None):
         """
         Split provided log file into smaller logs,
         each for the individual month represented in the provided log,
@@ -264,9 +2402,9 @@ class LogDivisor(object):
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.M)
+        return self._divide(WISENESS.M, progress)
 
-    def divide_day_wise(self, save_folder_path = None):
+    def divide_day_wise(self, save_folder_path = None, progress = None):
         """
         Split the provided log file into smaller logs,
         each for the individual day represented in the provided log,
@@ -274,7 +2412,243 @@ class LogDivisor(object):
         """
         if save_folder_path:
             self.save_folder_path = save_folder_path
-        self._divide_file(WISENESS.D)
+        return self._divide(WISENESS.D, progress)
+
+    def iter_buckets(self, wiseness = WISENESS.YMD, batch_size = 2**20,
+            max_pending_batches = 16, progress = None):
+        """
+        Splits the log file in one pass, without writing the sublog files,
+        yielding the (bucket, chunk) batches of the log entries.
+        The bucket is the sublog file name, relative to the output folder,
+        like "2019/Jan/01.log", and the chunk holds the log entries
+        of the bucket, in their order, as a string in text mode,
+        or bytes in binary mode, of at most batch_size characters or bytes,
+        unless a single log entry is longer.
+
+        The division runs in the background thread, waiting while
+        max_pending_batches batches are not consumed yet.
+        Leaving the generator early stops the division.
+        The DivisionStats are kept in the stats attribute.
+        """
+        self._check_sink_options()
+        queue_sink = _QueueSink(batch_size, max_pending_batches)
+        previous_sink, self.sink = self.sink, queue_sink
+
+        def divide():
+            try:
+                self._divide(wiseness, progress)
+            except _SinkClosed:
+                return
+            except BaseException as exception:
+                result = (None, exception)
+            else:
+                result = (None, None)
+
+            try:
+                queue_sink.put(result)
+            except _SinkClosed:
+                pass
+
+        division = threading.Thread(target=divide,
+            name="log_divisor_buckets", daemon=True)
+        division.start()
+        try:
+            while True:
+                bucket, chunk = queue_sink.queue.get()
+                if bucket is None:
+                    if chunk is not None:
+                        raise chunk
+                    return
+                yield bucket, chunk
+        finally:
+            queue_sink.closed.set()
+            division.join()
+            self.sink = previous_sink
+
+    def _check_sink_options(self):
+        if self.workers > 1 or self.coarse_levels != "write":
+            raise ValueError("The sink can not be combined with the workers "
+                "and the coarse levels, made of the sublog files.")
+
+    async def divide_log_file_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_log_file.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.YMD, progress)
+
+    async def divide_year_and_month_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_year_and_month_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.YM, progress)
+
+    async def divide_year_and_day_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_year_and_day_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.YD, progress)
+
+    async def divide_month_and_day_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_month_and_day_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.MD, progress)
+
+    async def divide_year_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_year_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.Y, progress)
+
+    async def divide_month_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_month_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.M, progress)
+
+    async def divide_day_wise_async(self, save_folder_path = None,
+            progress = None):
+        """
+        The asynchronous counterpart of divide_day_wise.
+        """
+        if save_folder_path:
+            self.save_folder_path = save_folder_path
+        return await self._divide_file_async(WISENESS.D, progress)
+
+
+class LogBatchDivisor(LogDivisor):
+    """
+    Log Batch Divisor Class.
+    Splits many log files, for example the rotated logs of a single
+    application, into a single tree of split logs.
+
+    The instance of the class must be supplied with the list of the log
+    file paths, the path to a folder holding the log files,
+    or a glob pattern, matching them.
+    The rest of the arguments are the same as of LogDivisor.
+    By default the split logs are saved next to the first log file.
+
+    The log files are merged by the timestamps of their entries, so every
+    split log is time ordered, as long as every log file is.
+    The corrupt entries follow the preceding entries of their log file.
+    The sublog files are opened once for all the log files.
+    The log files are always merged line by line from the start,
+    sorted_input, workers and resume arguments are ignored.
+    """
+    def __init__(self, log_file_paths, save_folder_path = None,
+            custom_formats = None, **options):
+        self.log_file_paths = self._find_log_files(log_file_paths)
+        if not self.log_file_paths:
+            raise ValueError(f"No log files found in {log_file_paths!r}.")
+
+        super().__init__(self.log_file_paths[0], save_folder_path,
+            custom_formats, **options)
+
+    @staticmethod
+    def _find_log_files(log_file_paths):
+        if not isinstance(log_file_paths, str):
+            return list(log_file_paths)
+
+        if os.path.isdir(log_file_paths):
+            log_file_paths = os.path.join(log_file_paths, "*")
+
+        paths = sorted(path for path in glob.glob(log_file_paths)
+            if os.path.isfile(path))
+        found = set(paths)
+
+        # The time indexes of the found log files and the checkpoints
+        # of the divisions are not log files.
+        def is_sidecar(path):
+            if os.path.basename(path) in (".log_divisor_checkpoint",
+                    ".log_divisor_checkpoint.tmp"):
+                return True
+            return any(path.endswith(suffix) and path[:-len(suffix)] in found
+                for suffix in (".idx", ".idx.tmp"))
+
+        return [path for path in paths if not is_sidecar(path)]
+
+    def _get_log_size(self):
+        return sum(os.path.getsize(path) for path in self.log_file_paths)
+
+    def _can_divide_in_blocks(self):
+        return False
+
+    def _iter_timestamped_lines(self, lines):
+        """
+        Yields the (timestamp, line) pairs of the log file lines.
+        The corrupt entries get the timestamp of the preceding entry.
+        """
+        timestamp = datetime.min
+        for line in lines:
+            timestamp = self._get_line_timestamp(line) or timestamp
+            yield timestamp, line
+
+    def _divide_file(self, wiseness):
+        self._start_division()
+        try:
+            with ExitStack() as stack:
+                streams = list()
+                for log_file_path in self.log_file_paths:
+                    if log_file_path == self.log_file_path:
+                        log_file = self.log_file
+                    else:
+                        log_file = stack.enter_context(
+                            self._open_log_file(log_file_path))
+
+                    if self.binary_mode \
+                            and not detect_compression(log_file_path):
+                        log_map = stack.enter_context(
+                            self._map_log_file(log_file))
+                        lines = self._iter_lines(log_map, 0, len(log_map))
+                    else:
+                        lines = log_file
+                    streams.append(self._iter_timestamped_lines(lines))
+
+                self.stats.bytes_read += self._get_log_size()
+                merged_lines = heapq.merge(*streams, key=itemgetter(0))
+                lines = (line for _, line in merged_lines)
+                if self._progress:
+                    lines = self._track_progress(lines)
+                self._divide_lines(lines, wiseness)
+                self._flush_sublog_files()
+        finally:
+            self.log_file.seek(0)
+            self._finish_division()
+
+
+def _divide_log_chunk(log_file_path, save_folder_path,
+        start, end, wiseness, options):
+    """
+    Splits the byte range of the log file into the save folder.
+    Runs in the worker process of the parallel division.
+    """
+    ld = LogDivisor(log_file_path, save_folder_path, **options)
+    ld._start_division()
+    try:
+        ld._divide_range(start, end, wiseness)
+    finally:
+        ld._finish_division()
+        ld.log_file.close()
+
+    return ld.stats
 
 
 if __name__ == "__main__":
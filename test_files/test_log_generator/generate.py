@@ -1,40 +1,174 @@
+"""
+Generates the test log files.
+
+The log entries are streamed to the file in chunks, so the size of the
+generated log file is not bounded by memory. The sorted log entries get
+increasing timestamps, spread evenly over the date span, instead of
+being sorted in memory.
+
+Run as a script to generate the sample.log file, configured by config.ini,
+or with the options below to generate larger log files:
+
+    python generate.py big.log --size 2G --shuffled --corrupt-ratio 0.01
+"""
+import os
 import time
-from random import random, choice
+import argparse
+from calendar import timegm
+from random import Random
 from configparser import RawConfigParser
 
-from most_common_words import thousand as words
+try:
+    from .most_common_words import thousand as words
+except ImportError:
+    from most_common_words import thousand as words
 
 
 config = RawConfigParser()
-config.read("config.ini")
+config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "config.ini"))
+
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+CHUNK_LINES = 10000
+
+
+def parse_size(size):
+    """
+    Parses the size in bytes, with an optional K, M, G or T suffix.
+    """
+    size = str(size).strip().upper().rstrip("B")
+    unit = size[-1:] if size[-1:] in SIZE_UNITS else ""
+    return int(float(size[:len(size) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def get_timestamp(date, format):
+    return timegm(time.strptime(date, format))
+
 
+def iter_log_entries(start_time, end_time, formats, amount,
+        words_per_line = 10, shuffled = False, corrupt_ratio = 0.0,
+        random = None):
+    """
+    Yields about the amount of log entries, dated between the start_time
+    and the end_time, in seconds since the epoch.
+    Each entry is dated in one of the formats, chosen at random,
+    and holds words_per_line random words. The corrupt_ratio of the entries
+    have no date at all.
+    Unless shuffled, the entries are ordered by time.
+    """
+    random = random or Random()
+    span = end_time - start_time
+    step = span / max(amount, 1)
+    timestamp = start_time
+    for _ in range(amount):
+        data = " ".join(random.choices(words, k=words_per_line))
+        if corrupt_ratio and random.random() < corrupt_ratio:
+            yield f"{data}\n"
+            continue
 
-def strf_time_prop(start, end, format, prop):
-    start_time = time.mktime(time.strptime(start, format))
-    end_time = time.mktime(time.strptime(end, format))
-    random_time = start_time + prop * (end_time - start_time)
+        if shuffled:
+            timestamp = start_time + random.random() * span
+        else:
+            timestamp = min(timestamp + random.random() * 2 * step, end_time)
 
-    return time.strftime(format, time.localtime(random_time))
+        date = time.strftime(random.choice(formats), time.gmtime(timestamp))
+        yield f"{date}: {data}\n"
 
 
-def get_random_date(start, end, prop):
-    return strf_time_prop(start, end, config.get('dates', 'format'), prop)
+def generate_log_file(path, amount = None, size = None,
+        start_date = "2018-1-1 00:00:00", end_date = "2019-12-12 23:59:59",
+        formats = ("%Y-%m-%d %H:%M:%S",), words_per_line = 10,
+        shuffled = False, corrupt_ratio = 0.0, seed = None):
+    """
+    Writes either the amount of log entries, or about size bytes
+    of log entries, to the log file at the path.
+    The start_date and the end_date are given in the first of the formats.
+    Returns the amount of the log entries written.
+    """
+    if (amount is None) == (size is None):
+        raise ValueError("Provide either the amount or the size.")
+
+    formats = list(formats)
+    start_time = get_timestamp(start_date, formats[0])
+    end_time = get_timestamp(end_date, formats[0])
+    random = Random(seed)
+
+    limit = amount
+    if size is not None:
+        sample = list(iter_log_entries(start_time, end_time, formats, 1000,
+            words_per_line, shuffled, corrupt_ratio, Random(seed)))
+        line_size = len("".join(sample).encode()) / len(sample)
+        limit = int(size / line_size) + CHUNK_LINES
+
+    written_lines = written_size = 0
+    entries = iter_log_entries(start_time, end_time, formats, limit,
+        words_per_line, shuffled, corrupt_ratio, random)
+    with open(path, "wb") as log_file:
+        while size is None or written_size < size:
+            chunk = [entry for _, entry in zip(range(CHUNK_LINES), entries)]
+            if not chunk:
+                break
+
+            data = "".join(chunk).encode()
+            if size is not None and written_size + len(data) > size:
+                data = data[:size - written_size]
+                data = data[:data.rfind(b"\n") + 1]
+                chunk = chunk[:data.count(b"\n")]
+
+            if not data:
+                break
+
+            log_file.write(data)
+            written_lines += len(chunk)
+            written_size += len(data)
+
+    return written_lines
 
 
 def generate_sample_log_file():
-    with open("sample.log", "w+") as sample_log_file:
-        log_entries = list()
-        for _ in range(config.getint('entries', 'amount')):
-            date = get_random_date(config.get('dates', 'start_date'),
-                                config.get('dates', 'end_date'),
-                                random())
+    generate_log_file("sample.log",
+        amount=config.getint('entries', 'amount'),
+        start_date=config.get('dates', 'start_date'),
+        end_date=config.get('dates', 'end_date'),
+        formats=config.get('dates', 'format').split("\n"),
+        words_per_line=config.getint('entries', 'words', fallback=10),
+        shuffled=config.getboolean('entries', 'shuffled', fallback=False),
+        corrupt_ratio=config.getfloat('entries', 'corrupt_ratio',
+            fallback=0.0))
+
+
+def main(args = None):
+    parser = argparse.ArgumentParser(description="Generates a test log file.")
+    parser.add_argument("path", nargs="?", default="sample.log")
+    amount = parser.add_mutually_exclusive_group()
+    amount.add_argument("--amount", type=int,
+        help="the amount of log entries")
+    amount.add_argument("--size", type=parse_size,
+        help="the size of the log file, like 500M or 2G")
+    parser.add_argument("--start-date",
+        default=config.get('dates', 'start_date'))
+    parser.add_argument("--end-date", default=config.get('dates', 'end_date'))
+    parser.add_argument("--format", dest="formats", action="append",
+        help="the date format, repeat to mix several formats")
+    parser.add_argument("--words", type=int,
+        default=config.getint('entries', 'words', fallback=10),
+        help="the amount of words in a log entry")
+    parser.add_argument("--shuffled", action="store_true",
+        default=config.getboolean('entries', 'shuffled', fallback=False))
+    parser.add_argument("--corrupt-ratio", type=float,
+        default=config.getfloat('entries', 'corrupt_ratio', fallback=0.0))
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(args)
 
-            data = " ".join(map(lambda _: choice(words), range(10)))
-            log_entries.append(f"{date}: {data}\n")
+    if args.amount is None and args.size is None:
+        args.amount = config.getint('entries', 'amount')
 
-        for log_entry in sorted(log_entries):
-            sample_log_file.write(log_entry)
+    written_lines = generate_log_file(args.path, args.amount, args.size,
+        args.start_date, args.end_date,
+        args.formats or config.get('dates', 'format').split("\n"),
+        args.words, args.shuffled, args.corrupt_ratio, args.seed)
+    print(f"{written_lines} log entries written to {args.path}")
 
 
 if __name__ == "__main__":
-    generate_sample_log_file()
+    main()
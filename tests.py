@@ -1,9 +1,69 @@
 import unittest
+import unittest.mock
 
 import os
+import re
+import bz2
+import gzip
+import lzma
+import time
+import asyncio
+import threading
 import shutil
+import tempfile
+from datetime import datetime
 
-from log_divisor import LogDivisor, WISENESS
+import log_divisor
+from log_divisor import LogDivisor, LogBatchDivisor, WISENESS, FileHandlePool, \
+    SublogWriter, TimeIndex, DATE_FORMAT, DATE_FORMATS, MixedDateFormat, \
+    FileSink
+from test_files.test_log_generator.generate import generate_log_file, \
+    parse_size
+
+
+def read_divided_tree(folder):
+    """
+    Reads every split log file under the folder into a dictionary,
+    keyed by the file path relative to the folder.
+    """
+    tree = dict()
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'r') as f:
+                tree[os.path.relpath(path, folder)] = f.read()
+
+    return tree
+
+
+def expected_divided_tree(log_file_path, wiseness):
+    """
+    A straightforward reference split of the log file,
+    the output of every division engine is compared against.
+    """
+    tree = dict()
+    with open(log_file_path, 'r') as log_file:
+        for line in log_file:
+            match = re.search(r'(\d+-\d+-\d+ \d+:\d+:\d+)', line)
+            try:
+                dt = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S')
+            except (AttributeError, ValueError):
+                names = ["corrupt_log_entries.log"]
+            else:
+                names = list()
+                if wiseness & WISENESS.Y == WISENESS.Y:
+                    names.append(f"{dt.year}.log")
+                if wiseness & WISENESS.M == WISENESS.M:
+                    names.append(f"{dt.year}/{dt.strftime('%b')}.log")
+                if wiseness & WISENESS.D == WISENESS.D:
+                    names.append(
+                        f"{dt.year}/{dt.strftime('%b')}/{dt.day:02d}.log")
+
+            for name in names:
+                name = os.path.normpath(name)
+                tree[name] = tree.get(name, "") + line
+
+    return tree
 
 
 class UnusedTestCases(unittest.TestCase):
@@ -108,3 +168,1228 @@ class BasicLogTests(unittest.TestCase):
         self.assertEqual(log_line, yearly_text)
         self.assertEqual(log_line, monthly_text)
         self.assertEqual(log_line, daily_text)
+
+
+class DatesCacheTests(unittest.TestCase):
+    """
+    The test cases for the single-parse engine and its dates cache.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_sample_log_split(self):
+        ld = LogDivisor("test_files/sample.log")
+        ld.divide_log_file(self.output_folder)
+
+        self.assertEqual(
+            expected_divided_tree("test_files/sample.log", WISENESS.YMD),
+            read_divided_tree(self.output_folder))
+        self.assertGreater(ld.cache_hits, 0)
+        self.assertEqual(ld.cache_hits + ld.cache_misses, 100)
+
+    def test_corrupt_log_split(self):
+        ld = LogDivisor("test_files/corrupt.log")
+        ld.divide_month_and_day_wise(self.output_folder)
+
+        self.assertEqual(
+            expected_divided_tree("test_files/corrupt.log", WISENESS.MD),
+            read_divided_tree(self.output_folder))
+
+    def test_invalid_time_of_cached_date_is_corrupt(self):
+        log_file_path = os.path.join(self.output_folder, "bad_time.log")
+        with open(log_file_path, 'w') as f:
+            f.write("2018-01-09 10:00:00 ok\n2018-01-09 99:99:99 bad time\n"
+                "2018-01-09 23:59:60 bad second\n2018-01-09 11:00:00 ok\n")
+
+        for binary_mode in (False, True):
+            with self.subTest(binary_mode=binary_mode):
+                output_folder = os.path.join(self.output_folder,
+                    f"divided_{binary_mode}")
+                ld = LogDivisor(log_file_path, binary_mode=binary_mode)
+                ld.divide_day_wise(output_folder)
+
+                self.assertEqual(
+                    expected_divided_tree(log_file_path, WISENESS.D),
+                    read_divided_tree(output_folder))
+                self.assertEqual(3, ld.cache_hits)
+
+    def test_cache_is_bounded(self):
+        ld = LogDivisor("test_files/sample.log", cache_size=2)
+        ld.divide_day_wise(self.output_folder)
+
+        self.assertLessEqual(len(ld._subfile_names_cache), 2)
+        self.assertLess(ld.cache_hit_rate, 1.0)
+
+
+class FileHandlePoolTests(unittest.TestCase):
+    """
+    The test cases for the bounded pool of the sublog file handles.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_evicted_files_are_appended(self):
+        pool = FileHandlePool(max_open_files=1)
+        first = os.path.join(self.output_folder, "first.log")
+        second = os.path.join(self.output_folder, "second.log")
+
+        pool.get(first).write("a\n")
+        pool.get(second).write("b\n")
+        pool.get(first).write("c\n")
+        pool.close()
+
+        with open(first, 'r') as f:
+            self.assertEqual("a\nc\n", f.read())
+        self.assertEqual((3, 2, 1),
+            (pool.opened, pool.evicted, pool.reopened))
+        self.assertEqual(0, len(pool))
+
+    def test_day_wise_split_with_small_pool(self):
+        ld = LogDivisor("test_files/sample.log", max_open_files=2)
+        ld.divide_log_file(self.output_folder)
+
+        self.assertEqual(
+            expected_divided_tree("test_files/sample.log", WISENESS.YMD),
+            read_divided_tree(self.output_folder))
+        self.assertGreater(ld.log_subfiles.evicted, 0)
+
+
+class SublogWriterTests(unittest.TestCase):
+    """
+    The test cases for the buffered writer of the sublog files.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_largest_buffer_is_flushed_first(self):
+        pool = FileHandlePool()
+        writer = SublogWriter(pool, memory_budget=10)
+        small = os.path.join(self.output_folder, "small.log")
+        large = os.path.join(self.output_folder, "large.log")
+
+        writer.write(small, "ab\n")
+        writer.write(large, "abcdef\n")
+        writer.write(large, "ab\n")
+
+        self.assertIn(large, pool)
+        self.assertNotIn(small, pool)
+        self.assertEqual(3, writer.buffered_size)
+
+        writer.flush_all()
+        pool.close()
+        with open(small, 'r') as f:
+            self.assertEqual("ab\n", f.read())
+
+    def test_directories_are_checked_once_per_file(self):
+        ld = LogDivisor("test_files/sample.log", memory_budget=64)
+        with unittest.mock.patch.object(ld, '_check_directory',
+                wraps=ld._check_directory) as check_directory:
+            ld.divide_year_wise(self.output_folder)
+
+        self.assertEqual(2, check_directory.call_count)
+        self.assertEqual(
+            expected_divided_tree("test_files/sample.log", WISENESS.Y),
+            read_divided_tree(self.output_folder))
+
+
+class BinaryModeTests(unittest.TestCase):
+    """
+    The test cases for the memory mapped, binary processing of the log file.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_binary_split_matches_text_split(self):
+        for log_file_path in ("test_files/sample.log", "test_files/corrupt.log",
+                "test_files/one_line.log"):
+            with self.subTest(log_file_path=log_file_path):
+                output_folder = os.path.join(self.output_folder,
+                    os.path.basename(log_file_path))
+                ld = LogDivisor(log_file_path, binary_mode=True)
+                ld.divide_log_file(output_folder)
+
+                self.assertEqual(
+                    expected_divided_tree(log_file_path, WISENESS.YMD),
+                    read_divided_tree(output_folder))
+
+    def test_invalid_characters_are_kept(self):
+        log_file_path = os.path.join(self.output_folder, "invalid.log")
+        log_text = (b"2018-01-01 19:49:16: caf\xe9 \xff\xfe\n"
+            b"2018-01-02 10:00:00: valid entry\n")
+        with open(log_file_path, 'wb') as f:
+            f.write(log_text)
+
+        ld = LogDivisor(log_file_path, binary_mode=True)
+        ld.divide_year_wise(os.path.join(self.output_folder, "divided"))
+
+        with open(os.path.join(self.output_folder, "divided/2018.log"),
+                'rb') as f:
+            self.assertEqual(log_text, f.read())
+
+    def test_empty_log_file(self):
+        log_file_path = os.path.join(self.output_folder, "empty.log")
+        open(log_file_path, 'w').close()
+
+        ld = LogDivisor(log_file_path, binary_mode=True)
+        ld.divide_log_file(os.path.join(self.output_folder, "divided"))
+
+        self.assertFalse(os.path.exists(
+            os.path.join(self.output_folder, "divided")))
+
+
+class SortedInputTests(unittest.TestCase):
+    """
+    The test cases for the bulk copying of the time ordered log files.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_sorted_split_matches_reference(self):
+        for binary_mode in (False, True):
+            for log_file_path in ("test_files/sample.log",
+                    "test_files/corrupt.log", "test_files/one_line.log"):
+                with self.subTest(log_file_path=log_file_path,
+                        binary_mode=binary_mode):
+                    output_folder = os.path.join(self.output_folder,
+                        f"{binary_mode}_{os.path.basename(log_file_path)}")
+                    ld = LogDivisor(log_file_path, binary_mode=binary_mode,
+                        sorted_input=True, max_open_files=2)
+                    ld.divide_log_file(output_folder)
+
+                    self.assertEqual(
+                        expected_divided_tree(log_file_path, WISENESS.YMD),
+                        read_divided_tree(output_folder))
+
+    def test_sorted_log_is_not_split_line_by_line(self):
+        ld = LogDivisor("test_files/sample.log", sorted_input=True)
+        with unittest.mock.patch.object(ld, '_divide_lines') as divide_lines:
+            ld.divide_month_wise(self.output_folder)
+
+        divide_lines.assert_not_called()
+        self.assertEqual(
+            expected_divided_tree("test_files/sample.log", WISENESS.M),
+            read_divided_tree(self.output_folder))
+
+    def test_out_of_order_range_is_split_line_by_line(self):
+        log_file_path = os.path.join(self.output_folder, "unordered.log")
+        with open(log_file_path, 'w') as f:
+            f.write("2019-01-01 00:00:00: b\n2018-01-01 00:00:00: a\n")
+
+        ld = LogDivisor(log_file_path, sorted_input=True)
+        ld.divide_year_wise(os.path.join(self.output_folder, "divided"))
+
+        self.assertEqual(
+            expected_divided_tree(log_file_path, WISENESS.Y),
+            read_divided_tree(os.path.join(self.output_folder, "divided")))
+
+    def test_corrupt_lines_of_uniform_range_are_split_out(self):
+        log_file_path = os.path.join(self.output_folder, "corrupt.log")
+        with open(log_file_path, 'w') as f:
+            f.write("2018-01-09 10:00:00: a\ngarbage line\n"
+                "2018-01-09 99:99:99: b\n2018-01-09 12:00:00: c\n")
+
+        for binary_mode in (False, True):
+            with self.subTest(binary_mode=binary_mode):
+                output_folder = os.path.join(self.output_folder,
+                    f"divided_{binary_mode}")
+                ld = LogDivisor(log_file_path, binary_mode=binary_mode,
+                    sorted_input=True)
+                ld.divide_day_wise(output_folder)
+
+                self.assertEqual(
+                    expected_divided_tree(log_file_path, WISENESS.D),
+                    read_divided_tree(output_folder))
+
+    def test_out_of_order_lines_of_uniform_range_are_split_out(self):
+        log_file_path = os.path.join(self.output_folder, "jitter.log")
+        with open(log_file_path, 'w') as f:
+            f.write("2018-01-09 10:00:00: a\n2018-01-10 00:00:01: b\n"
+                "2018-01-09 12:00:00: c\n")
+
+        custom_format = DATE_FORMAT('%Y-%m-%d %H:%M:%S',
+            r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+        for number, date_format in enumerate((None, custom_format)):
+            for wiseness in (WISENESS.D, WISENESS.YM):
+                with self.subTest(date_format=date_format,
+                        wiseness=wiseness):
+                    output_folder = os.path.join(self.output_folder,
+                        f"divided_{number}_{wiseness.value}")
+                    ld = LogDivisor(log_file_path, output_folder,
+                        custom_formats=date_format, sorted_input=True)
+                    ld._divide_file(wiseness)
+
+                    self.assertEqual(
+                        expected_divided_tree(log_file_path, wiseness),
+                        read_divided_tree(output_folder))
+
+    def test_shuffled_log_matches_reference(self):
+        log_file_path = os.path.join(self.output_folder, "shuffled.log")
+        generate_log_file(log_file_path, amount=3000, shuffled=True,
+            corrupt_ratio=0.01, seed=1)
+
+        ld = LogDivisor(log_file_path, sorted_input=True, binary_mode=True)
+        ld.min_sorted_range = 0
+        ld.divide_log_file(os.path.join(self.output_folder, "divided"))
+
+        self.assertEqual(expected_divided_tree(log_file_path, WISENESS.YMD),
+            read_divided_tree(os.path.join(self.output_folder, "divided")))
+
+
+class ParallelDivisionTests(unittest.TestCase):
+    """
+    The test cases for the parallel division of the log file.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_parallel_split_matches_reference(self):
+        for sorted_input in (False, True):
+            for log_file_path in ("test_files/sample.log",
+                    "test_files/corrupt.log", "test_files/one_line.log"):
+                with self.subTest(log_file_path=log_file_path,
+                        sorted_input=sorted_input):
+                    output_folder = os.path.join(self.output_folder,
+                        f"{sorted_input}_{os.path.basename(log_file_path)}")
+                    ld = LogDivisor(log_file_path, workers=3,
+                        sorted_input=sorted_input)
+                    ld.divide_log_file(output_folder)
+
+                    self.assertEqual(
+                        expected_divided_tree(log_file_path, WISENESS.YMD),
+                        read_divided_tree(output_folder))
+
+    def test_chunks_are_newline_aligned(self):
+        ld = LogDivisor("test_files/sample.log")
+        offsets = ld._get_chunk_offsets(7)
+
+        with open("test_files/sample.log", 'rb') as f:
+            log_text = f.read()
+        self.assertEqual(0, offsets[0])
+        self.assertEqual(len(log_text), offsets[-1])
+        for offset in offsets[1:-1]:
+            self.assertEqual(b"\n", log_text[offset - 1:offset])
+
+
+class AsyncDivisionTests(unittest.TestCase):
+    """
+    The test cases for the asynchronous divide methods.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_concurrent_async_splits(self):
+        progress = [list() for _ in range(6)]
+        ticks = list()
+
+        async def tick(done):
+            while not done.is_set():
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        async def divide_all():
+            divisions = list()
+            for number, binary_mode in enumerate((False, True) * 3):
+                ld = LogDivisor("test_files/sample.log",
+                    binary_mode=binary_mode)
+                ld.async_block_size = 512
+                ld.async_block_lines = 8
+                divisions.append(ld.divide_day_wise_async(
+                    os.path.join(self.output_folder, str(number)),
+                    lambda *report, number=number:
+                        progress[number].append(report)))
+
+            done = asyncio.Event()
+            ticker = asyncio.ensure_future(tick(done))
+            await asyncio.gather(*divisions)
+            done.set()
+            await ticker
+
+        asyncio.run(divide_all())
+
+        expected_tree = expected_divided_tree("test_files/sample.log",
+            WISENESS.D)
+        for number in range(6):
+            self.assertEqual(expected_tree, read_divided_tree(
+                os.path.join(self.output_folder, str(number))))
+
+        size = os.path.getsize("test_files/sample.log")
+        for reports in progress:
+            self.assertGreater(len(reports), 1)
+            self.assertEqual((size, size), reports[-1])
+        self.assertGreater(len(ticks), 6)
+
+
+class BatchDivisionTests(unittest.TestCase):
+    """
+    The test cases for the merged division of many log files.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.logs_folder = os.path.join(self.output_folder, "logs")
+        os.makedirs(self.logs_folder)
+
+        with open("test_files/sample.log", 'r') as f:
+            lines = f.readlines()
+        for number in range(3):
+            name = "app.log" + (f".{number}" if number else "")
+            with open(os.path.join(self.logs_folder, name), 'w') as f:
+                f.writelines(lines[number::3])
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_merged_split_matches_single_log_split(self):
+        expected_tree = expected_divided_tree("test_files/sample.log",
+            WISENESS.YMD)
+        log_file_paths = (self.logs_folder,
+            os.path.join(self.logs_folder, "app.log*"),
+            [os.path.join(self.logs_folder, name)
+                for name in ("app.log.2", "app.log.1", "app.log")])
+
+        for binary_mode in (False, True):
+            for number, paths in enumerate(log_file_paths):
+                with self.subTest(paths=paths, binary_mode=binary_mode):
+                    output_folder = os.path.join(self.output_folder,
+                        f"{binary_mode}_{number}")
+                    ld = LogBatchDivisor(paths, binary_mode=binary_mode)
+                    ld.divide_log_file(output_folder)
+
+                    self.assertEqual(expected_tree,
+                        read_divided_tree(output_folder))
+
+    def test_sidecar_files_are_not_divided(self):
+        app_log_path = os.path.join(self.logs_folder, "app.log")
+        list(LogDivisor(app_log_path).query("2018-01-01 00:00:00",
+            "2018-02-01 00:00:00"))
+        for name in ("app.log.idx.tmp", ".log_divisor_checkpoint",
+                ".log_divisor_checkpoint.tmp"):
+            with open(os.path.join(self.logs_folder, name), 'w') as f:
+                f.write("{}")
+
+        for number, paths in enumerate((self.logs_folder,
+                os.path.join(self.logs_folder, "app.log*"))):
+            with self.subTest(paths=paths):
+                output_folder = os.path.join(self.output_folder, str(number))
+                ld = LogBatchDivisor(paths)
+                self.assertEqual([app_log_path, app_log_path + ".1",
+                    app_log_path + ".2"], ld.log_file_paths)
+
+                ld.divide_log_file(output_folder)
+                self.assertEqual(expected_divided_tree(
+                    "test_files/sample.log", WISENESS.YMD),
+                    read_divided_tree(output_folder))
+
+    def test_sublog_files_are_opened_once(self):
+        ld = LogBatchDivisor(self.logs_folder)
+        ld.divide_year_wise(os.path.join(self.output_folder, "divided"))
+
+        self.assertEqual(2, ld.log_subfiles.opened)
+
+    def test_default_output_folder(self):
+        ld = LogBatchDivisor(self.logs_folder)
+        ld.divide_year_wise()
+
+        self.assertEqual(expected_divided_tree("test_files/sample.log",
+            WISENESS.Y), read_divided_tree(os.path.join(self.logs_folder,
+                "app")))
+
+
+class ResumeAndFollowTests(unittest.TestCase):
+    """
+    The test cases for the incremental division of the growing log file.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.log_file_path = os.path.join(self.output_folder, "app.log")
+        self.divided_folder = os.path.join(self.output_folder, "divided")
+        with open("test_files/sample.log", 'r') as f:
+            self.lines = f.readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def append_to_log(self, text):
+        with open(self.log_file_path, 'a') as f:
+            f.write(text)
+
+    def assert_divided_like(self, lines, wiseness=WISENESS.YMD):
+        reference_path = os.path.join(self.output_folder, "reference.log")
+        with open(reference_path, 'w') as f:
+            f.writelines(lines)
+
+        tree = read_divided_tree(self.divided_folder)
+        tree.pop(".log_divisor_checkpoint", None)
+        self.assertEqual(expected_divided_tree(reference_path, wiseness), tree)
+
+    def test_resumed_division_appends_new_entries(self):
+        for binary_mode, workers in ((False, 1), (True, 1), (False, 2)):
+            with self.subTest(binary_mode=binary_mode, workers=workers):
+                shutil.rmtree(self.divided_folder, ignore_errors=True)
+                open(self.log_file_path, 'w').close()
+
+                def divide():
+                    ld = LogDivisor(self.log_file_path, self.divided_folder,
+                        binary_mode=binary_mode, workers=workers, resume=True)
+                    ld.divide_log_file()
+                    ld.log_file.close()
+
+                self.append_to_log("".join(self.lines[:40]))
+                divide()
+                self.assert_divided_like(self.lines[:40])
+
+                self.append_to_log("".join(self.lines[40:70]) +
+                    self.lines[70][:10])
+                divide()
+                self.assert_divided_like(self.lines[:70])
+
+                self.append_to_log(self.lines[70][10:] +
+                    "".join(self.lines[71:]))
+                divide()
+                self.assert_divided_like(self.lines)
+
+    def test_truncated_log_is_split_from_start(self):
+        self.append_to_log("".join(self.lines[:40]))
+        LogDivisor(self.log_file_path, self.divided_folder,
+            resume=True).divide_year_wise()
+
+        with open(self.log_file_path, 'w') as f:
+            f.writelines(self.lines[40:50])
+        LogDivisor(self.log_file_path, self.divided_folder,
+            resume=True).divide_year_wise()
+
+        self.assert_divided_like(self.lines[:50], WISENESS.Y)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 10
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_follow_log_file_with_rotation(self):
+        self.append_to_log("".join(self.lines[:30]))
+        ld = LogDivisor(self.log_file_path, binary_mode=True)
+        stop_event = threading.Event()
+        follower = threading.Thread(target=ld.follow_log_file, kwargs=dict(
+            save_folder_path=self.divided_folder, wiseness=WISENESS.D,
+            poll_interval=0.01, stop_event=stop_event))
+        follower.start()
+
+        def checkpoint_offset():
+            return (ld._read_checkpoint() or dict()).get("offset")
+
+        try:
+            self.wait_for(lambda: checkpoint_offset() == os.path.getsize(
+                self.log_file_path))
+            self.append_to_log("".join(self.lines[30:60]))
+            os.rename(self.log_file_path, self.log_file_path + ".1")
+            self.append_to_log("".join(self.lines[60:]))
+            self.wait_for(lambda: checkpoint_offset() == os.path.getsize(
+                self.log_file_path) and ld.log_file.name == self.log_file_path
+                and os.fstat(ld.log_file.fileno()).st_ino ==
+                    os.stat(self.log_file_path).st_ino)
+        finally:
+            stop_event.set()
+            follower.join()
+
+        self.assert_divided_like(self.lines, WISENESS.D)
+
+
+class TimeIndexTests(unittest.TestCase):
+    """
+    The test cases for the sidecar time index and the range queries.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.log_file_path = os.path.join(self.output_folder, "app.log")
+        with open("test_files/sample.log", 'r') as f:
+            self.lines = f.readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def write_log(self, lines, mode='w'):
+        with open(self.log_file_path, mode) as f:
+            f.writelines(lines)
+
+    def expected_entries(self, lines, start, end):
+        start = datetime.strptime(start, '%Y-%m-%d %H:%M:%S')
+        end = datetime.strptime(end, '%Y-%m-%d %H:%M:%S')
+        entries = list()
+        for line in lines:
+            try:
+                timestamp = datetime.strptime(line[:19], '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                continue
+            if start <= timestamp < end:
+                entries.append(line)
+
+        return entries
+
+    def test_query_matches_full_scan(self):
+        self.write_log(self.lines)
+        ranges = (("2018-01-09 08:00:00", "2018-01-09 14:00:00"),
+            ("2018-03-01 00:00:00", "2018-09-01 00:00:00"),
+            ("2017-01-01 00:00:00", "2017-01-02 00:00:00"))
+
+        for binary_mode in (False, True):
+            ld = LogDivisor(self.log_file_path, binary_mode=binary_mode)
+            for start, end in ranges:
+                with self.subTest(start=start, binary_mode=binary_mode):
+                    entries = list(ld.query(start, end))
+                    if binary_mode:
+                        entries = [entry.decode() for entry in entries]
+                    self.assertEqual(
+                        self.expected_entries(self.lines, start, end),
+                        entries)
+
+        self.assertTrue(TimeIndex.load(self.log_file_path + ".idx").ordered)
+
+    def test_index_is_updated_incrementally(self):
+        self.write_log(self.lines[:50])
+        ld = LogDivisor(self.log_file_path)
+        index = ld.build_index()
+        self.assertEqual(os.path.getsize(self.log_file_path), index.size)
+
+        self.write_log(self.lines[50:], 'a')
+        with unittest.mock.patch.object(ld, '_index_range',
+                wraps=ld._index_range) as index_range:
+            entries = list(ld.query("2018-01-01 00:00:00",
+                "2020-01-01 00:00:00"))
+
+        index_range.assert_called_once()
+        self.assertEqual(index.size, index_range.call_args[0][2])
+        self.assertEqual(self.lines, entries)
+
+    def test_last_entry_without_newline_is_queried(self):
+        self.write_log(self.lines[:10] + [self.lines[10].rstrip("\n")])
+
+        for binary_mode in (False, True):
+            with self.subTest(binary_mode=binary_mode):
+                ld = LogDivisor(self.log_file_path, binary_mode=binary_mode)
+                entries = list(ld.query("2018-01-01 00:00:00",
+                    "2020-01-01 00:00:00"))
+                if binary_mode:
+                    entries = [entry.decode() for entry in entries]
+                self.assertEqual(self.lines[:10] +
+                    [self.lines[10].rstrip("\n")], entries)
+                self.assertEqual(len("".join(self.lines[:10]).encode()),
+                    ld.build_index().size)
+
+        ld = LogDivisor("test_files/one_line.log")
+        self.assertEqual(1, len(list(ld.query("2018-01-01 00:00:00",
+            "2019-01-01 00:00:00"))))
+        self.assertFalse(os.path.exists("test_files/one_line.log.idx"))
+
+    def test_query_of_unordered_log(self):
+        lines = self.lines[50:] + open("test_files/corrupt.log").readlines() \
+            + self.lines[:50]
+        self.write_log(lines)
+        start, end = "2018-06-01 00:00:00", "2019-06-01 00:00:00"
+
+        entries = list(LogDivisor(self.log_file_path).query(start, end))
+
+        self.assertFalse(TimeIndex.load(self.log_file_path + ".idx").ordered)
+        self.assertEqual(self.expected_entries(lines, start, end), entries)
+
+    def test_truncated_index_is_rebuilt(self):
+        self.write_log(self.lines)
+        ld = LogDivisor(self.log_file_path)
+        ld.build_index()
+        index_path = self.log_file_path + ".idx"
+        with open(index_path, 'rb') as f:
+            data = f.read()
+
+        for size in (len(data) - 3, len(data) - 8, TimeIndex.header.size):
+            with self.subTest(size=size):
+                with open(index_path, 'wb') as f:
+                    f.write(data[:size])
+
+                self.assertIsNone(TimeIndex.load(index_path))
+                self.assertEqual(self.lines, list(ld.query(
+                    "2018-01-01 00:00:00", "2020-01-01 00:00:00")))
+
+
+class CompressionTests(unittest.TestCase):
+    """
+    The test cases for the compressed log files and sublog files.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        with open("test_files/sample.log", 'rb') as f:
+            self.log_data = f.read()
+        self.expected_tree = expected_divided_tree("test_files/sample.log",
+            WISENESS.YMD)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_compressed_log_files_are_read(self):
+        log_files = (("sample.log.gz", gzip.compress),
+            ("sample.log.xz", lzma.compress),
+            ("sample_without_extension", bz2.compress))
+
+        for name, compress in log_files:
+            log_file_path = os.path.join(self.output_folder, name)
+            with open(log_file_path, 'wb') as f:
+                f.write(compress(self.log_data))
+
+            for binary_mode in (False, True):
+                with self.subTest(name=name, binary_mode=binary_mode):
+                    output_folder = os.path.join(self.output_folder,
+                        f"{name}_{binary_mode}")
+                    ld = LogDivisor(log_file_path, binary_mode=binary_mode,
+                        sorted_input=True, workers=2, resume=True)
+                    ld.divide_log_file(output_folder)
+
+                    self.assertEqual(self.expected_tree,
+                        read_divided_tree(output_folder))
+
+        ld = LogDivisor(os.path.join(self.output_folder, "sample.log.gz"))
+        ld.divide_log_file()
+        self.assertEqual(self.expected_tree,
+            read_divided_tree(os.path.join(self.output_folder, "sample")))
+
+    def test_compressed_log_file_is_not_followed(self):
+        log_file_path = os.path.join(self.output_folder, "sample.log.gz")
+        with open(log_file_path, 'wb') as f:
+            f.write(gzip.compress(self.log_data))
+
+        ld = LogDivisor(log_file_path)
+        with self.assertRaises(ValueError):
+            ld.follow_log_file(self.output_folder,
+                stop_event=threading.Event())
+
+    def test_sublog_files_are_compressed(self):
+        options = ({}, dict(binary_mode=True), dict(sorted_input=True),
+            dict(workers=2), dict(binary_mode=True, memory_budget=100))
+
+        for compression, open_file in (("gz", gzip.open),
+                ("bz2", bz2.open), ("xz", lzma.open)):
+            for number, kwargs in enumerate(options):
+                with self.subTest(compression=compression, **kwargs):
+                    output_folder = os.path.join(self.output_folder,
+                        f"{compression}_{number}")
+                    ld = LogDivisor("test_files/sample.log",
+                        compression=compression, **kwargs)
+                    ld.divide_log_file(output_folder)
+
+                    tree = dict()
+                    for root, _, files in os.walk(output_folder):
+                        for name in files:
+                            self.assertTrue(name.endswith("." + compression))
+                            path = os.path.join(root, name)
+                            with open_file(path, 'rt') as f:
+                                tree[os.path.relpath(path, output_folder)[
+                                    :-len(compression) - 1]] = f.read()
+                    self.assertEqual(self.expected_tree, tree)
+
+    def test_sorted_ranges_are_compressed_in_pieces(self):
+        sizes = list()
+        write = log_divisor.CompressingSublogWriter.write
+
+        def recording_write(writer, file_name, line):
+            sizes.append(len(line))
+            write(writer, file_name, line)
+
+        with unittest.mock.patch.object(log_divisor.CompressingSublogWriter,
+                'write', recording_write):
+            ld = LogDivisor("test_files/sample.log", compression="gz",
+                sorted_input=True, memory_budget=1000)
+            ld.divide_year_wise(self.output_folder)
+
+        longest_line = max(map(len, self.log_data.splitlines(True)))
+        self.assertGreater(len(sizes), 1)
+        self.assertLess(max(sizes), 1000 + longest_line)
+        with gzip.open(os.path.join(self.output_folder, "2018.log.gz"),
+                'rt') as f:
+            self.assertEqual(expected_divided_tree("test_files/sample.log",
+                WISENESS.Y)["2018.log"], f.read())
+
+
+class DateFormatTests(unittest.TestCase):
+    """
+    The test cases for the date formats, compiled from the time formats,
+    and their detection.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_timestamps_match_strptime(self):
+        timestamps = (('%Y-%m-%d %H:%M:%S', "2019-05-06 14:03:09"),
+            ('%Y-%m-%dT%H:%M:%S.%f', "2019-05-06T14:03:09.25"),
+            ('%d/%b/%Y:%H:%M:%S', "06/May/2019:14:03:09"),
+            ('%y%m%d %I:%M %p', "190506 02:03 PM"),
+            ('%I:%M %p %d.%m.%Y', "12:03 AM 06.05.2019"),
+            ('%Y-%m-%d %I:%M:%S', "2019-05-06 12:30:00"),
+            ('%Y-%m-%d %H:%M %p', "2019-05-06 14:03 AM"),
+            ('%Y %j', "2019 126"))
+
+        for date_strp, text in timestamps:
+            with self.subTest(date_strp=date_strp):
+                date_format = DATE_FORMAT(date_strp)
+                expected = datetime.strptime(text, date_strp)
+                self.assertEqual(expected, date_format.parse(f"[{text}] x"))
+                match = date_format.bytes_re.search(f"[{text}] x".encode())
+                self.assertEqual(expected,
+                    date_format.extract_timestamp(match))
+
+    def test_invalid_timestamps(self):
+        date_format = DATE_FORMAT()
+        for text in ("2019-02-30 10:00:00", "2019-13-01 10:00:00",
+                "2019-01-01 24:00:00", "12019-01-01 10:00:00"):
+            with self.subTest(text=text):
+                match = date_format.re.search(text)
+                self.assertFalse(match and date_format.extract_timestamp(match))
+
+        date_format = DATE_FORMAT('%Y-%m-%d %I:%M:%S')
+        for text in ("2019-01-01 15:30:00", "2019-01-01 00:30:00"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    datetime.strptime(text, date_format.strp)
+                match = date_format.re.search(text)
+                self.assertIsNone(date_format.extract_timestamp(match))
+                self.assertFalse(date_format.valid_time(match))
+
+    def test_format_detection(self):
+        samples = (("syslog", "May  6 14:03:09 host sshd[1]: message\n"),
+            ("apache", '127.0.0.1 - - [06/May/2019:14:03:09 +0000] "GET /"\n'),
+            ("iso8601", "2019-05-06T14:03:09Z level=info\n"),
+            ("epoch", "1557151389.123 message\n"))
+
+        for name, line in samples:
+            with self.subTest(name=name):
+                self.assertIs(DATE_FORMATS[name],
+                    DATE_FORMAT.detect([line, "garbage\n", line]))
+
+        mixed = DATE_FORMAT.detect([line for _, line in samples])
+        self.assertIsInstance(mixed, MixedDateFormat)
+        self.assertEqual(4, len(mixed.date_formats))
+
+    def test_stray_numbers_are_not_detected_as_epoch(self):
+        log_file_path = os.path.join(self.output_folder, "stray.log")
+        with open("test_files/sample.log", 'r') as f:
+            lines = f.readlines()
+        lines.insert(50, "user 1234567890 failed\n")
+        lines.insert(60, "1234567890 unknown format\n")
+        with open(log_file_path, 'w') as f:
+            f.writelines(lines)
+
+        self.assertIsNone(DATE_FORMATS["epoch"].re.search(lines[50]))
+        ld = LogDivisor(log_file_path, custom_formats="auto")
+        self.assertIs(DATE_FORMATS["default"], ld.date_frm)
+        ld.divide_year_wise(os.path.join(self.output_folder, "divided"))
+
+        self.assertEqual(expected_divided_tree(log_file_path, WISENESS.Y),
+            read_divided_tree(os.path.join(self.output_folder, "divided")))
+
+    def test_mixed_format_log_split(self):
+        log_file_path = os.path.join(self.output_folder, "mixed.log")
+        lines = ["2018-01-01 10:00:00 default\n",
+            "2018-01-01T11:00:00 iso\n",
+            '1.2.3.4 [02/Jan/2018:10:00:00 +0000] "GET /"\n',
+            "1514887200 epoch\n",
+            "no timestamp\n"]
+        with open(log_file_path, 'w') as f:
+            f.writelines(lines)
+
+        for binary_mode in (False, True):
+            with self.subTest(binary_mode=binary_mode):
+                output_folder = os.path.join(self.output_folder,
+                    str(binary_mode))
+                ld = LogDivisor(log_file_path, custom_formats="auto",
+                    binary_mode=binary_mode)
+                ld.divide_day_wise(output_folder)
+
+                self.assertEqual({
+                        os.path.normpath("2018/Jan/01.log"): "".join(lines[:2]),
+                        os.path.normpath("2018/Jan/02.log"): "".join(lines[2:4]),
+                        "corrupt_log_entries.log": lines[4]},
+                    read_divided_tree(output_folder))
+
+    def test_custom_regex(self):
+        date_format = DATE_FORMAT('%Y-%m-%d %H:%M:%S',
+            r'(\d+-\d+-\d+ \d+:\d+:\d+)')
+        ld = LogDivisor("test_files/corrupt.log", custom_formats=date_format)
+        ld.divide_log_file(self.output_folder)
+
+        self.assertEqual(
+            expected_divided_tree("test_files/corrupt.log", WISENESS.YMD),
+            read_divided_tree(self.output_folder))
+
+
+@unittest.skipUnless(log_divisor.numpy, "NumPy is not installed")
+class VectorizedDivisionTests(unittest.TestCase):
+    """
+    The test cases for the NumPy vectorized division engine.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_vectorized_split_matches_reference(self):
+        log_file_path = os.path.join(self.output_folder, "unordered.log")
+        with open("test_files/sample.log", 'r') as f:
+            lines = f.readlines()
+        with open("test_files/corrupt.log", 'r') as f:
+            lines += f.readlines()
+        with open(log_file_path, 'w') as f:
+            f.writelines(lines[::-1] + ["x 2019-02-29 10:00:00 leap\n",
+                "2016-02-29 10:00:00 leap\n", "2018-01-01 10:00:00.5 late\n",
+                "2018-01-01 10:00:001 digit", "\n"])
+
+        for log_file_path in (log_file_path, "test_files/sample.log",
+                "test_files/one_line.log"):
+            for wiseness in (WISENESS.YMD, WISENESS.YD, WISENESS.M):
+                for binary_mode in (False, True):
+                    with self.subTest(log_file_path=log_file_path,
+                            wiseness=wiseness, binary_mode=binary_mode):
+                        output_folder = os.path.join(self.output_folder,
+                            "divided")
+                        shutil.rmtree(output_folder, ignore_errors=True)
+                        ld = LogDivisor(log_file_path, output_folder,
+                            vectorized=True, binary_mode=binary_mode)
+                        ld.vectorized_block_size = 1000
+                        ld._divide_file(wiseness)
+
+                        self.assertEqual(
+                            expected_divided_tree(log_file_path, wiseness),
+                            read_divided_tree(output_folder))
+
+    def test_variable_width_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            LogDivisor("test_files/sample.log", vectorized=True,
+                custom_formats=DATE_FORMATS["syslog"])
+
+
+class DivisionStatsTests(unittest.TestCase):
+    """
+    The test cases for the division statistics, progress and profiling.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_stats_match_divided_tree(self):
+        log_file_path = "test_files/corrupt.log"
+        expected_tree = expected_divided_tree(log_file_path, WISENESS.YMD)
+        expected_lines = {name: text.count("\n")
+            for name, text in expected_tree.items()}
+
+        for options in ({}, {"binary_mode": True}, {"workers": 2},
+                {"vectorized": True} if log_divisor.numpy else {}):
+            with self.subTest(options=options):
+                output_folder = os.path.join(self.output_folder,
+                    str(len(os.listdir(self.output_folder))))
+                ld = LogDivisor(log_file_path, **options)
+                stats = ld.divide_log_file(output_folder)
+
+                self.assertIs(ld.stats, stats)
+                self.assertEqual(expected_lines, stats.bucket_lines)
+                self.assertEqual(expected_lines["corrupt_log_entries.log"],
+                    stats.corrupt_lines)
+                with open(log_file_path, 'rb') as f:
+                    log_text = f.read()
+                self.assertEqual(len(log_text), stats.bytes_read)
+                self.assertEqual(log_text.count(b"\n"), stats.lines_read)
+                if "workers" in options:
+                    self.assertLess(len(expected_tree), stats.files_opened)
+                else:
+                    self.assertEqual(len(expected_tree), stats.files_opened)
+                self.assertGreater(stats.timings["write"], 0)
+                self.assertGreater(stats.elapsed, 0)
+
+    def test_progress_reports(self):
+        size = os.path.getsize("test_files/sample.log")
+        for options in ({}, {"binary_mode": True}, {"sorted_input": True},
+                {"workers": 3}):
+            with self.subTest(options=options):
+                reports = list()
+                ld = LogDivisor("test_files/sample.log", **options)
+                ld.progress_interval = 1000
+                ld.divide_year_wise(self.output_folder,
+                    lambda *report: reports.append(report))
+
+                self.assertGreater(len(reports), 2)
+                self.assertEqual((size, size), reports[-1])
+                self.assertEqual(sorted(reports), reports)
+                self.assertEqual(len(set(reports)), len(reports))
+
+    def test_profiler_hook(self):
+        profiler = unittest.mock.Mock()
+        ld = LogDivisor("test_files/sample.log", profiler=profiler)
+        ld.divide_day_wise(self.output_folder)
+
+        self.assertEqual(["enable", "disable"],
+            [name for name, _, _ in profiler.method_calls])
+
+
+class CoarseLevelsTests(unittest.TestCase):
+    """
+    The test cases for the coarser split levels, made of the finest one.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_copied_levels_match_reference(self):
+        methods = (("divide_log_file", WISENESS.YMD),
+            ("divide_year_and_day_wise", WISENESS.YD),
+            ("divide_month_and_day_wise", WISENESS.MD),
+            ("divide_year_and_month_wise", WISENESS.YM))
+
+        for options in ({}, {"binary_mode": True}, {"workers": 2}):
+            for method, wiseness in methods:
+                with self.subTest(options=options, method=method):
+                    output_folder = os.path.join(self.output_folder, method)
+                    shutil.rmtree(output_folder, ignore_errors=True)
+                    ld = LogDivisor("test_files/sample.log",
+                        coarse_levels="copy", **options)
+                    stats = getattr(ld, method)(output_folder)
+
+                    expected_tree = expected_divided_tree(
+                        "test_files/sample.log", wiseness)
+                    self.assertEqual(expected_tree,
+                        read_divided_tree(output_folder))
+                    self.assertEqual({name: text.count("\n")
+                            for name, text in expected_tree.items()},
+                        stats.bucket_lines)
+
+    def test_unordered_levels_are_grouped_by_day(self):
+        log_file_path = os.path.join(self.output_folder, "unordered.log")
+        with open("test_files/sample.log", 'r') as f:
+            lines = f.readlines()
+        with open(log_file_path, 'w') as f:
+            f.writelines(lines[::-1])
+
+        output_folder = os.path.join(self.output_folder, "divided")
+        ld = LogDivisor(log_file_path, coarse_levels="copy")
+        ld.divide_year_and_day_wise(output_folder)
+
+        days = expected_divided_tree(log_file_path, WISENESS.D)
+        expected_tree = dict(days)
+        for name in sorted(days, key=lambda name: datetime.strptime(
+                name, os.path.normpath("%Y/%b/%d.log"))):
+            year_name = f"{name.split(os.sep)[0]}.log"
+            expected_tree[year_name] = expected_tree.get(year_name, "") + \
+                days[name]
+        self.assertEqual(expected_tree, read_divided_tree(output_folder))
+
+    def test_manifests_list_finest_files(self):
+        ld = LogDivisor("test_files/sample.log", coarse_levels="manifest")
+        ld.divide_log_file(self.output_folder)
+
+        tree = read_divided_tree(self.output_folder)
+        expected_tree = expected_divided_tree("test_files/sample.log",
+            WISENESS.YMD)
+        manifests = {name[:-len(".manifest")]: text
+            for name, text in tree.items() if name.endswith(".manifest")}
+        self.assertEqual(expected_divided_tree("test_files/sample.log",
+            WISENESS.D), {name: text for name, text in tree.items()
+                if not name.endswith(".manifest")})
+        self.assertEqual({name for name in expected_tree
+            if name.count(os.sep) < 2}, set(manifests))
+        for name, manifest in manifests.items():
+            self.assertEqual(expected_tree[name], "".join(
+                tree[os.path.normpath(finest_name)]
+                for finest_name in manifest.splitlines()))
+
+    def test_resumed_division_rebuilds_coarse_levels(self):
+        log_file_path = os.path.join(self.output_folder, "app.log")
+        output_folder = os.path.join(self.output_folder, "divided")
+        with open("test_files/sample.log", 'r') as f:
+            lines = f.readlines()
+
+        for part in (lines[:50], lines[50:]):
+            with open(log_file_path, 'a') as f:
+                f.writelines(part)
+            ld = LogDivisor(log_file_path, output_folder, resume=True,
+                coarse_levels="copy")
+            ld.divide_log_file()
+            ld.log_file.close()
+
+        tree = read_divided_tree(output_folder)
+        tree.pop(".log_divisor_checkpoint")
+        self.assertEqual(expected_divided_tree("test_files/sample.log",
+            WISENESS.YMD), tree)
+
+
+class SinkTests(unittest.TestCase):
+    """
+    The test cases for the sinks of the split log entries
+    and the streamed buckets.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.divided_folder = os.path.join(self.output_folder, "divided")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_file_sink_writes_through_pool(self):
+        pool = FileHandlePool()
+        file_name = os.path.join(self.output_folder, "sink.log")
+        FileSink(pool).write(file_name, ["ab\n", "cd\n"])
+        pool.close()
+
+        with open(file_name, 'r') as f:
+            self.assertEqual("ab\ncd\n", f.read())
+
+    def test_custom_sink_receives_buckets(self):
+        class CollectingSink(object):
+            def __init__(self):
+                self.buckets = dict()
+
+            def write(self, bucket, chunks):
+                text = "".join(chunk if isinstance(chunk, str)
+                    else bytes(chunk).decode() for chunk in chunks)
+                bucket = os.path.normpath(bucket)
+                self.buckets[bucket] = self.buckets.get(bucket, "") + text
+
+        for options in ({}, {"binary_mode": True}, {"sorted_input": True},
+                {"vectorized": True} if log_divisor.numpy else {}):
+            with self.subTest(options=options):
+                sink = CollectingSink()
+                ld = LogDivisor("test_files/sample.log", self.divided_folder,
+                    memory_budget=256, sink=sink, **options)
+                ld.divide_log_file()
+
+                self.assertEqual(expected_divided_tree(
+                    "test_files/sample.log", WISENESS.YMD), sink.buckets)
+                self.assertFalse(os.path.exists(self.divided_folder))
+
+    def test_iterated_buckets_are_bounded(self):
+        for options in ({}, {"binary_mode": True, "sorted_input": True}):
+            with self.subTest(options=options):
+                buckets = dict()
+                ld = LogDivisor("test_files/corrupt.log", self.divided_folder,
+                    **options)
+                for bucket, chunk in ld.iter_buckets(WISENESS.YD,
+                        batch_size=200, max_pending_batches=1):
+                    if isinstance(chunk, bytes):
+                        chunk = chunk.decode()
+                    self.assertLessEqual(len(chunk), 200)
+                    bucket = os.path.normpath(bucket)
+                    buckets[bucket] = buckets.get(bucket, "") + chunk
+
+                self.assertEqual(expected_divided_tree(
+                    "test_files/corrupt.log", WISENESS.YD), buckets)
+                self.assertEqual(sum(text.count("\n")
+                    for text in buckets.values()), ld.stats.lines_read * 2 -
+                    ld.stats.corrupt_lines)
+                self.assertFalse(os.path.exists(self.divided_folder))
+                self.assertIsNone(ld.sink)
+
+    def test_sorted_ranges_are_decoded_in_pieces(self):
+        sizes = list()
+        ld = LogDivisor("test_files/sample.log", self.divided_folder,
+            sorted_input=True)
+        get_block_chunk = ld._get_block_chunk
+
+        def recording_get_block_chunk(lines):
+            sizes.append(len(lines))
+            return get_block_chunk(lines)
+
+        buckets = dict()
+        with unittest.mock.patch.object(ld, '_get_block_chunk',
+                recording_get_block_chunk):
+            for bucket, chunk in ld.iter_buckets(WISENESS.Y,
+                    batch_size=200):
+                buckets[bucket] = buckets.get(bucket, "") + chunk
+
+        with open("test_files/sample.log", 'r') as f:
+            longest_line = max(map(len, f))
+        self.assertGreater(len(sizes), 2)
+        self.assertLess(max(sizes), 200 + longest_line)
+        self.assertEqual(expected_divided_tree("test_files/sample.log",
+            WISENESS.Y), buckets)
+
+    def test_leaving_iteration_stops_division(self):
+        ld = LogDivisor("test_files/sample.log", self.divided_folder,
+            memory_budget=64)
+        buckets = ld.iter_buckets(batch_size=10, max_pending_batches=1)
+        next(buckets)
+        buckets.close()
+
+        with open("test_files/sample.log", 'r') as f:
+            self.assertLess(ld.stats.lines_read, len(f.readlines()))
+        self.assertIsNone(ld.sink)
+
+    def test_division_errors_are_raised(self):
+        ld = LogDivisor("test_files/sample.log", self.divided_folder)
+        with unittest.mock.patch.object(ld, '_get_subfile_names',
+                side_effect=RuntimeError("broken")):
+            with self.assertRaises(RuntimeError):
+                list(ld.iter_buckets())
+
+        with self.assertRaises(ValueError):
+            LogDivisor("test_files/sample.log", workers=2, sink=FileSink(None))
+
+
+class LogGeneratorTests(unittest.TestCase):
+    """
+    The test cases for the streaming test log generator.
+    """
+    def setUp(self):
+        self.output_folder = tempfile.mkdtemp()
+        self.log_file_path = os.path.join(self.output_folder, "generated.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_folder)
+
+    def test_generated_log_has_the_size(self):
+        generate_log_file(self.log_file_path, size=parse_size("1M"),
+            corrupt_ratio=0.1, seed=1)
+
+        with open(self.log_file_path, 'rb') as f:
+            log_text = f.read()
+        self.assertLessEqual(len(log_text), 2**20)
+        self.assertGreater(len(log_text), 2**20 - 1000)
+        self.assertTrue(log_text.endswith(b"\n"))
+
+        lines = log_text.decode().splitlines()
+        dates = [line[:19] for line in lines if DATE_FORMAT().re.match(line)]
+        self.assertEqual(sorted(dates), dates)
+        self.assertLess(len(dates), 0.95 * len(lines))
+        self.assertGreater(len(dates), 0.85 * len(lines))
+
+    def test_generated_log_mixes_the_formats(self):
+        formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"]
+        written_lines = generate_log_file(self.log_file_path, amount=500,
+            formats=formats, shuffled=True, seed=1)
+        output_folder = os.path.join(self.output_folder, "divided")
+
+        ld = LogDivisor(self.log_file_path, custom_formats="auto")
+        ld.divide_year_wise(output_folder)
+        tree = read_divided_tree(output_folder)
+        self.assertEqual({"2018.log", "2019.log"}, set(tree))
+        self.assertEqual(500, written_lines)
+        self.assertEqual(500, sum(text.count("\n") for text in tree.values()))